@@ -2,20 +2,39 @@
 离线大数据处理智能代理
 """
 
-from .core.agent import BigDataAgent
-from .core.base_llm import BaseLLM
-
-# 导入外部llms模块
-try:
-    from llms import SiliconFlowLLM, get_chat_model
-    _llms_available = True
-except ImportError:
-    _llms_available = False
+import importlib
+import importlib.util
 
 __version__ = "0.1.0"
 __author__ = "BigData Agent Team"
 
+# 按需导入的导出对象：名称 -> 所在模块。BigDataAgent 会连带加载执行引擎、NLP和LLM客户端，
+# BaseLLM 会导入numpy/numba，SiliconFlowLLM / get_chat_model 来自外部llms模块，均在首次访问时才导入
+_LAZY_EXPORTS = {
+    'BigDataAgent': 'bigdata_agent.core.agent',
+    'BaseLLM': 'bigdata_agent.core.base_llm',
+    'SiliconFlowLLM': 'llms',
+    'get_chat_model': 'llms',
+}
+
+# 外部llms模块及其依赖是否可用（只查找不导入）
+_llms_available = all(
+    importlib.util.find_spec(name) is not None
+    for name in ('llms', 'openai', 'langchain_openai')
+)
+
 __all__ = ['BigDataAgent', 'BaseLLM']
 
 if _llms_available:
     __all__.extend(['SiliconFlowLLM', 'get_chat_model'])
+
+
+def __getattr__(name):
+    """按需导入导出对象，导入后缓存到包命名空间"""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
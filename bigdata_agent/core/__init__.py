@@ -2,7 +2,24 @@
 核心组件模块
 """
 
-from .agent import BigDataAgent
-from .base_llm import BaseLLM
+import importlib
 
 __all__ = ['BigDataAgent', 'BaseLLM']
+
+# 导出对象 -> 所在子模块：BigDataAgent 会连带加载全部子模块，BaseLLM 会导入numpy/numba，
+# 均在首次访问时才导入
+_LAZY_EXPORTS = {
+    'BigDataAgent': '.agent',
+    'BaseLLM': '.base_llm',
+}
+
+
+def __getattr__(name):
+    """按需导入导出对象，导入后缓存到包命名空间"""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
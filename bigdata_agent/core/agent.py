@@ -4,14 +4,18 @@
 """
 
 import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable
 
+from .base_llm import start_jit_warm_up
 from ..nlp.query_analyzer import QueryAnalyzer
 from ..task.task_builder import TaskBuilder
 from ..execution.engine_factory import EngineFactory
 from ..result.result_processor import ResultProcessor
+from ..utils.clock import iso_now, elapsed_seconds
 
 
 class BigDataAgent:
@@ -28,12 +32,22 @@ class BigDataAgent:
         self.engine_type = engine_type
         self.engine_config = engine_config or EngineFactory.get_engine_config_template(engine_type)
 
+        # 后台预编译JIT函数，与下面的组件初始化和引擎连接重叠进行
+        start_jit_warm_up()
+
         # 初始化组件
         self.query_analyzer = QueryAnalyzer()
         self.task_builder = TaskBuilder()
         self.result_processor = ResultProcessor()
         self.execution_engine = None
 
+        # 连接时缓存的执行引擎绑定方法
+        self._exec: Optional[Callable] = None
+        self._exec_count: Optional[Callable] = None
+
+        # query_async各阶段使用的线程池，按需创建
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+
         # 连接状态
         self.connected = False
 
@@ -47,10 +61,7 @@ class BigDataAgent:
             if not logging.getLogger().handlers:
                 setup_logging()
 
-        print("🤖 BigData Agent初始化完成")
-        print(f"   执行引擎: {engine_type}")
-
-        self.logger.info(f"BigData Agent初始化完成，执行引擎: {engine_type}")
+        self.logger.info("BigData Agent初始化完成，执行引擎: %s", engine_type)
 
     def connect(self) -> bool:
         """
@@ -62,15 +73,17 @@ class BigDataAgent:
         try:
             self.execution_engine = EngineFactory.create_engine(self.engine_type, self.engine_config)
             self.connected = self.execution_engine.connect()
+            self._exec = self.execution_engine.execute_query
+            self._exec_count = self.execution_engine.execute_count_query
 
             if self.connected:
-                print("✅ 执行引擎连接成功")
+                self.logger.info("执行引擎连接成功")
             else:
-                print("❌ 执行引擎连接失败")
+                self.logger.error("执行引擎连接失败")
             return self.connected
 
         except Exception as e:
-            print(f"❌ 连接执行引擎失败: {e}")
+            self.logger.error("连接执行引擎失败: %s", e)
             self.connected = False
             return False
 
@@ -79,8 +92,12 @@ class BigDataAgent:
         if self.execution_engine:
             self.execution_engine.disconnect()
             self.execution_engine = None
+        self._exec = self._exec_count = None
+        for pool in self._pools.values():
+            pool.shutdown(wait=False)
+        self._pools.clear()
         self.connected = False
-        print("✅ 执行引擎已断开连接")
+        self.logger.info("执行引擎已断开连接")
 
     def query(self, user_query: str, output_format: str = "json", **kwargs) -> Dict[str, Any]:
         """
@@ -89,7 +106,8 @@ class BigDataAgent:
         Args:
             user_query: 用户的自然语言查询
             output_format: 输出格式 (json, csv, chart, table)
-            **kwargs: 额外参数
+            **kwargs: 额外参数，use_cache=False 时不读写执行引擎的结果缓存，
+                preview=True 时限制返回行数，include_meta=False 时不附加 query_info
 
         Returns:
             dict: 查询结果
@@ -98,72 +116,161 @@ class BigDataAgent:
             return {
                 'success': False,
                 'error': '执行引擎未连接，请先调用 connect()',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': iso_now()
             }
 
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
 
         try:
-            # 记录用户查询
-            self.business_logger.info(f"用户查询: '{user_query}'")
+            analyzed_query, task = self._plan_query(user_query, **kwargs)
 
-            # 1. NLP分析查询
-            print(f"🔍 分析查询: {user_query}")
-            self.logger.debug(f"开始分析查询: {user_query}")
+            execution_result, execution_time = self._execute_task(task)
 
-            analyzed_query = self.query_analyzer.analyze_query(user_query)
+            return self._finish_query(user_query, output_format, analyzed_query, task,
+                                      execution_result, execution_time, **kwargs)
 
-            intent_result = analyzed_query.intent_result
-            print(f"   识别意图: {intent_result.intent.value}")
-            print(f"   数据源: {analyzed_query.data_source.table}")
-            print(".2f")
+        except Exception as e:
+            return self._query_error(e, start_ns)
 
-            # 记录意图识别结果
-            self.business_logger.info(
-                f"意图识别: '{user_query}' -> {intent_result.intent.value} (置信度: {intent_result.confidence:.2f})"
+    async def query_async(self, user_query: str, output_format: str = "json", **kwargs) -> Dict[str, Any]:
+        """
+        异步执行用户查询
+
+        NLP分析/任务构建、引擎执行、结果处理分别在独立的线程池中运行，
+        多个查询并发时，一个查询的NLP分析可以与另一个查询的引擎执行重叠
+
+        Args:
+            user_query: 用户的自然语言查询
+            output_format: 输出格式 (json, csv, chart, table)
+            **kwargs: 额外参数，同 query()
+
+        Returns:
+            dict: 查询结果
+        """
+        if not self.connected:
+            return {
+                'success': False,
+                'error': '执行引擎未连接，请先调用 connect()',
+                'timestamp': iso_now()
+            }
+
+        loop = asyncio.get_running_loop()
+        start_ns = time.monotonic_ns()
+
+        try:
+            analyzed_query, task = await loop.run_in_executor(
+                self._get_pool('cpu'),
+                functools.partial(self._plan_query, user_query, **kwargs)
             )
 
-            # 2. 构建执行任务
-            print("🏗️ 构建执行任务")
-            task = self.task_builder.build_task(
-                analyzed_query=analyzed_query,
-                engine_type=self.engine_type,
-                priority=kwargs.get('priority', 1),
-                timeout_seconds=kwargs.get('timeout', 3600)
+            execution_result, execution_time = await loop.run_in_executor(
+                self._get_pool('io'), self._execute_task, task
             )
 
-            print(f"   任务ID: {task.task_config.task_id}")
-            print(f"   SQL: {task.sql_query[:100]}...")
+            return await loop.run_in_executor(
+                self._get_pool('cpu'),
+                functools.partial(self._finish_query, user_query, output_format, analyzed_query, task,
+                                  execution_result, execution_time, **kwargs)
+            )
 
-            # 记录SQL生成
-            self.business_logger.info(f"生成SQL ({self.engine_type}): {task.sql_query[:100]}...")
+        except Exception as e:
+            return self._query_error(e, start_ns)
+
+    def _get_pool(self, kind: str) -> ThreadPoolExecutor:
+        """获取阶段线程池（cpu: NLP分析与结果处理，io: 引擎执行），按需创建"""
+        pool = self._pools.get(kind)
+        if pool is None:
+            max_workers = self.engine_config.get('max_concurrency', 4) if kind == 'io' else 2
+            pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"agent-{kind}")
+            self._pools[kind] = pool
+        return pool
+
+    def _plan_query(self, user_query: str, **kwargs):
+        """
+        查询阶段1-2：NLP分析并构建执行任务
 
-            # 3. 执行查询
-            print("⚡ 执行查询")
-            execution_start = time.time()
-            execution_result = self.execution_engine.execute_query(task.sql_query, task)
-            execution_time = time.time() - execution_start
-            print(".2f")
+        Returns:
+            tuple: (解析后的查询, 执行任务)
+        """
+        # 记录用户查询
+        self.business_logger.info("用户查询: '%s'", user_query)
+
+        # 1. NLP分析查询
+        self.logger.debug("开始分析查询: %s", user_query)
+
+        analyzed_query = self.query_analyzer.analyze_query(user_query)
+
+        # 2. 构建执行任务
+        task = self.task_builder.build_task(
+            analyzed_query=analyzed_query,
+            engine_type=self.engine_type,
+            priority=kwargs.get('priority', 1),
+            timeout_seconds=kwargs.get('timeout', 3600),
+            preview=kwargs.get('preview', False)
+        )
+
+        if not kwargs.get('use_cache', True):
+            task.task_config.cacheable = False
+
+        intent_result = analyzed_query.intent_result
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "识别意图: %s | 数据源: %s | 置信度: %.2f",
+                intent_result.intent.value, analyzed_query.data_source.table, intent_result.confidence
+            )
 
-            # 记录执行结果
-            if execution_result.get('success'):
-                self.business_logger.info(
-                    f"任务执行完成: {task.task_config.task_id} | 耗时: {execution_time:.3f}s | 返回行数: {execution_result.get('row_count', 0)}"
-                )
-            else:
-                self.business_logger.error(
-                    f"任务执行失败: {task.task_config.task_id} | 耗时: {execution_time:.3f}s | 错误: {execution_result.get('error', '未知错误')}"
-                )
-            # 4. 处理结果
-            print("📊 处理结果")
-            processed_result = self.result_processor.process_result(
-                execution_result=execution_result,
-                analyzed_query=analyzed_query,
-                output_format=output_format,
-                **kwargs
+        # 记录意图识别结果
+        self.business_logger.info(
+            "意图识别: '%s' -> %s (置信度: %.2f)", user_query, intent_result.intent.value, intent_result.confidence
+        )
+
+        self.logger.debug("任务ID: %s", task.task_config.task_id)
+
+        # 记录SQL生成
+        self.business_logger.info("生成SQL (%s): %.100s...", self.engine_type, task.sql_query)
+
+        return analyzed_query, task
+
+    def _execute_task(self, task):
+        """
+        查询阶段3：在执行引擎上运行任务
+
+        Returns:
+            tuple: (执行结果, 执行耗时秒数)
+        """
+        execution_start = time.monotonic_ns()
+        execution_result = self._exec(task.sql_query, task)
+        execution_time = elapsed_seconds(execution_start)
+        self.logger.debug("执行耗时: %.2fs", execution_time)
+
+        # 记录执行结果
+        if execution_result.get('cache_hit'):
+            self.business_logger.info("命中结果缓存: %s", task.task_config.task_id)
+        elif execution_result.get('success'):
+            self.business_logger.info(
+                "任务执行完成: %s | 耗时: %.3fs | 返回行数: %s",
+                task.task_config.task_id, execution_time, execution_result.get('row_count', 0)
             )
+        else:
+            self.business_logger.error(
+                "任务执行失败: %s | 耗时: %.3fs | 错误: %s",
+                task.task_config.task_id, execution_time, execution_result.get('error', '未知错误')
+            )
+
+        return execution_result, execution_time
+
+    def _finish_query(self, user_query: str, output_format: str, analyzed_query, task,
+                      execution_result: Dict[str, Any], execution_time: float, **kwargs) -> Dict[str, Any]:
+        """查询阶段4：处理执行结果并附加元信息"""
+        processed_result = self.result_processor.process_result(
+            execution_result=execution_result,
+            analyzed_query=analyzed_query,
+            output_format=output_format,
+            **kwargs
+        )
 
-            # 添加额外的元信息
+        # 添加额外的元信息，include_meta=False 时跳过
+        if kwargs.get('include_meta', True):
             processed_result['query_info'] = {
                 'original_query': user_query,
                 'analyzed_query': self.query_analyzer.to_dict(analyzed_query),
@@ -171,25 +278,26 @@ class BigDataAgent:
                 'total_time': execution_time
             }
 
-            if processed_result.get('success'):
-                print("✅ 查询执行成功")
-            else:
-                print(f"❌ 查询执行失败: {processed_result.get('error')}")
+        if processed_result.get('success'):
+            self.logger.debug("查询执行成功")
+        else:
+            self.logger.warning("查询执行失败: %s", processed_result.get('error'))
 
-            return processed_result
+        return processed_result
 
-        except Exception as e:
-            execution_time = time.time() - start_time
-            error_msg = f"查询处理失败: {str(e)}"
+    def _query_error(self, error: Exception, start_ns: int) -> Dict[str, Any]:
+        """构建查询失败结果"""
+        execution_time = elapsed_seconds(start_ns)
+        error_msg = f"查询处理失败: {str(error)}"
 
-            print(f"❌ {error_msg}")
+        self.logger.error("%s", error_msg)
 
-            return {
-                'success': False,
-                'error': error_msg,
-                'timestamp': datetime.now().isoformat(),
-                'execution_time': execution_time
-            }
+        return {
+            'success': False,
+            'error': error_msg,
+            'timestamp': iso_now(),
+            'execution_time': execution_time
+        }
 
     def preview_query(self, user_query: str, sample_size: int = 5) -> Dict[str, Any]:
         """
@@ -210,11 +318,11 @@ class BigDataAgent:
             analyzed_query = self.query_analyzer.analyze_query(user_query)
 
             # 构建采样任务
-            task = self.task_builder.build_task(analyzed_query, self.engine_type)
+            task = self.task_builder.build_task(analyzed_query, self.engine_type, preview=True)
 
             # 执行采样查询
             if task.sample_sql:
-                execution_result = self.execution_engine.execute_query(task.sample_sql, task)
+                execution_result = self._exec(task.sample_sql, task)
                 processed_result = self.result_processor.process_result(
                     execution_result, analyzed_query, 'table'
                 )
@@ -236,7 +344,7 @@ class BigDataAgent:
         status = {
             'connected': self.connected,
             'engine_type': self.engine_type,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': iso_now()
         }
 
         if self.execution_engine:
@@ -265,8 +373,7 @@ class BigDataAgent:
 
             # 获取数据量估算
             if self.connected and task.count_sql:
-                count_result = self.execution_engine.execute_count_query(task.count_sql, task)
-                estimation['estimated_row_count'] = count_result
+                estimation['estimated_row_count'] = self._exec_count(task.count_sql, task)
             else:
                 estimation['estimated_row_count'] = '未知'
 
@@ -284,24 +391,57 @@ class BigDataAgent:
 
     def batch_query(self, queries: List[str], output_format: str = "json") -> List[Dict[str, Any]]:
         """
-        批量执行查询
+        批量执行查询，并发数由引擎配置 max_parallel_queries 控制（默认4）
+
+        引擎配置 coalesce_queries=True 时，批内相同的SQL只会执行一次
 
         Args:
             queries: 查询列表
             output_format: 输出格式
 
         Returns:
-            list: 查询结果列表
+            list: 查询结果列表，与输入顺序一致
         """
-        results = []
-
-        for i, query in enumerate(queries, 1):
-            print(f"\n📝 执行查询 {i}/{len(queries)}")
+        if not queries:
+            return []
+
+        # 预估本批查询的LLM token消耗
+        llm = getattr(self.query_analyzer, 'llm', None)
+        if llm is not None:
+            estimated_tokens = llm.estimate_tokens_batch(queries)
+            self.logger.info("批量查询: %d 条，预估输入token数: %d", len(queries), sum(estimated_tokens))
+
+        def run(indexed_query):
+            index, query = indexed_query
+            self.logger.debug("执行查询 %d/%d", index, len(queries))
             result = self.query(query, output_format)
-            result['batch_index'] = i
-            results.append(result)
+            result['batch_index'] = index
+            return result
+
+        max_workers = min(len(queries), self.engine_config.get('max_parallel_queries', 4))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run, enumerate(queries, 1)))
+
+    async def batch_query_async(self, queries: List[str], output_format: str = "json") -> List[Dict[str, Any]]:
+        """
+        异步批量执行查询，并发数由引擎配置 max_concurrency 控制（默认4）
+
+        Args:
+            queries: 查询列表
+            output_format: 输出格式
+
+        Returns:
+            list: 查询结果列表，与输入顺序一致
+        """
+        semaphore = asyncio.Semaphore(self.engine_config.get('max_concurrency', 4))
+
+        async def run(index: int, query: str) -> Dict[str, Any]:
+            async with semaphore:
+                result = await self.query_async(query, output_format)
+            result['batch_index'] = index
+            return result
 
-        return results
+        return list(await asyncio.gather(*(run(i, query) for i, query in enumerate(queries, 1))))
 
     def __enter__(self):
         """上下文管理器入口"""
@@ -3,13 +3,72 @@
 定义LLM接口规范
 """
 
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMPY_AVAILABLE:
+    def _estimate_tokens_batch(lengths):
+        """按字符数批量估算token数（空文本为0，其余至少为1）"""
+        tokens = np.maximum(1, (lengths * 0.3).astype(np.int64))
+        return np.where(lengths == 0, 0, tokens)
+
+    if NUMBA_AVAILABLE:
+        _estimate_tokens_batch = njit(cache=True)(_estimate_tokens_batch)
+
+
+def warm_up_jit():
+    """用示例输入触发所有numba函数的编译（或从磁盘缓存加载）"""
+    if NUMPY_AVAILABLE and NUMBA_AVAILABLE:
+        _estimate_tokens_batch(np.zeros(1, dtype=np.int64))
+
+
+@lru_cache(maxsize=1)
+def start_jit_warm_up() -> None:
+    """
+    在后台线程中执行 warm_up_jit，进程内只启动一次
+
+    由调用方显式调用（BigDataAgent 初始化时），使编译与LLM/执行引擎的连接初始化重叠进行；
+    numba不可用时不做任何事
+    """
+    if NUMPY_AVAILABLE and NUMBA_AVAILABLE:
+        threading.Thread(target=warm_up_jit, name="bigdata-agent-jit-warmup", daemon=True).start()
 
 
 class BaseLLM(ABC):
     """基础LLM抽象类"""
 
+    # get_shared() 创建的共享实例，每个子类一个
+    _shared_instances: Dict[type, 'BaseLLM'] = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def get_shared(cls) -> 'BaseLLM':
+        """
+        获取使用默认配置构建的共享实例
+
+        构建失败（如缺少API Key）时抛出异常且不缓存，下次调用会重新尝试
+        """
+        with cls._shared_lock:
+            instance = BaseLLM._shared_instances.get(cls)
+            if instance is None:
+                instance = BaseLLM._shared_instances[cls] = cls()
+            return instance
+
     def __init__(self, api_key: str, model_name: Optional[str] = None):
         """初始化基础LLM"""
         self.api_key = api_key
@@ -22,9 +81,34 @@ class BaseLLM(ABC):
 
     @abstractmethod
     def invoke(self, system_prompt: str, user_prompt: str, **kwargs) -> str:
-        """调用LLM生成回复"""
+        """
+        调用LLM生成回复
+
+        kwargs 可以包含 messages：预先构建好的OpenAI格式消息列表。支持的实现应直接使用它，
+        不再由 system_prompt / user_prompt 构建消息，便于批量调用时复用同一条系统消息
+        """
         pass
 
+    def invoke_batch(self, system_prompt: str, user_prompts: List[str],
+                     return_exceptions: bool = False, **kwargs) -> List[Any]:
+        """
+        使用同一系统提示词批量调用LLM，结果与user_prompts顺序一致
+
+        默认逐条调用invoke，支持并发或批量接口的子类可以覆盖
+
+        Args:
+            return_exceptions: 为True时单条失败以异常对象放入结果列表，否则直接抛出
+        """
+        results = []
+        for user_prompt in user_prompts:
+            try:
+                results.append(self.invoke(system_prompt, user_prompt, **kwargs))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
     @abstractmethod
     def get_model_info(self) -> Dict[str, Any]:
         """获取模型信息"""
@@ -49,3 +133,12 @@ class BaseLLM(ABC):
 
         # 粗略估算：平均每个字符约0.3个token
         return max(1, int(len(text) * 0.3))
+
+    def estimate_tokens_batch(self, texts: List[str]) -> List[int]:
+        """批量估算token数量，结果与逐条调用estimate_tokens一致"""
+        if not NUMPY_AVAILABLE:
+            return [self.estimate_tokens(text) for text in texts]
+
+        lengths = np.fromiter((len(text) if text else 0 for text in texts),
+                              dtype=np.int64, count=len(texts))
+        return _estimate_tokens_batch(lengths).tolist()
@@ -3,10 +3,118 @@
 创建和管理不同类型的执行引擎
 """
 
-from typing import Dict, Any, Optional
+import re
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Tuple
 from abc import ABC, abstractmethod
 
 from ..task.task_builder import DataTask
+from ..utils.cache import LRUCache
+
+# 只读查询语句：结果可缓存，也可改写LIMIT；SET/USE/SHOW/EXPLAIN 等会话语句不在其中
+_QUERY_VERBS = frozenset({'SELECT', 'WITH'})
+
+# 语句的首个关键字
+_FIRST_TOKEN_RE = re.compile(r'\s*([A-Za-z]+)')
+
+# 字符串字面量（支持反斜杠转义和 '' 转义）与反引号标识符
+_QUOTED_RE = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`[^`]*`)""", re.DOTALL)
+
+# 字符串字面量/引号标识符（第1组）或注释（第2组），字面量中的 -- 与 /* 不会被当作注释
+_QUOTED_OR_COMMENT_RE = re.compile(_QUOTED_RE.pattern + r'|(--[^\n]*|/\*.*?\*/)', re.DOTALL)
+
+# 语句结尾可忽略的字符
+_TRAILING_NOISE = ' \t\r\n;'
+
+# 连续空白
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 语句末尾的LIMIT子句：LIMIT n / LIMIT n OFFSET m / LIMIT m, n
+_TRAILING_LIMIT_RE = re.compile(
+    r'\bLIMIT\s+(\d+)(?:\s*,\s*(\d+)|\s+OFFSET\s+(\d+))?\s*;?\s*$', re.IGNORECASE
+)
+
+# 语句末尾不带LIMIT的OFFSET / FETCH子句，无法直接追加LIMIT
+_TRAILING_PAGING_RE = re.compile(r'\b(?:OFFSET|FETCH)\b[^()]*;?\s*$', re.IGNORECASE)
+
+
+def statement_verb(sql: str) -> str:
+    """
+    返回SQL语句的首个关键字（大写），无法识别时返回空字符串
+
+    只匹配开头的关键字，不对整条SQL做 upper() 复制
+    """
+    match = _FIRST_TOKEN_RE.match(sql)
+    return match.group(1).upper() if match else ''
+
+
+def _strip_trailing(sql: str) -> str:
+    """
+    去除语句末尾的注释、分号和空白
+
+    只去除最后一段有效SQL之后的注释，语句中间的注释（如 /*+ MAPJOIN(t) */ 提示）保持原样
+    """
+    code_end = pos = 0
+    for match in _QUOTED_OR_COMMENT_RE.finditer(sql):
+        code = sql[pos:match.start()].rstrip(_TRAILING_NOISE)
+        if code.strip():
+            code_end = pos + len(code)
+        if match.group(1) is not None:
+            code_end = match.end()
+        pos = match.end()
+    code = sql[pos:].rstrip(_TRAILING_NOISE)
+    if code.strip():
+        code_end = pos + len(code)
+    return sql[:code_end]
+
+
+def inject_limit(sql: str, limit: int) -> str:
+    """
+    为SELECT语句追加或收紧LIMIT，使返回行数不超过limit
+
+    已有更小的LIMIT时保持原样；非查询语句不做改写。末尾已有LIMIT时保留其OFFSET，
+    只有OFFSET / FETCH而没有LIMIT时包装为子查询再限制。
+    末尾的 -- / /* */ 注释先被去除，否则追加的LIMIT会落在注释里
+    """
+    if statement_verb(sql) not in _QUERY_VERBS:
+        return sql
+
+    stripped = _strip_trailing(sql)
+
+    match = _TRAILING_LIMIT_RE.search(stripped)
+    if match:
+        count, comma_count, offset = match.groups()
+        head = stripped[:match.start()]
+        if comma_count is not None:
+            # LIMIT m, n：m为偏移量，n为行数
+            if int(comma_count) <= limit:
+                return sql
+            return f"{head}LIMIT {count}, {limit}"
+        if int(count) <= limit:
+            return sql
+        if offset is not None:
+            return f"{head}LIMIT {limit} OFFSET {offset}"
+        return f"{head}LIMIT {limit}"
+
+    if _TRAILING_PAGING_RE.search(stripped):
+        return f"SELECT * FROM ({stripped}) _limited LIMIT {limit}"
+
+    return f"{stripped} LIMIT {limit}"
+
+
+def _normalize_sql(sql: str) -> str:
+    """
+    规范化SQL文本（合并引号外的空白、去除结尾分号），用于生成缓存键
+
+    字符串字面量和带引号的标识符保持原样，'a  b' 与 'a b' 不会得到相同的键
+    """
+    parts = _QUOTED_RE.split(sql.strip().rstrip(';').rstrip())
+    # split 的捕获组位于奇数下标，只规范化偶数下标的引号外文本
+    parts[::2] = [_WHITESPACE_RE.sub(' ', part) for part in parts[::2]]
+    return "".join(parts)
 
 
 class ExecutionEngine(ABC):
@@ -17,6 +125,19 @@ class ExecutionEngine(ABC):
         self.config = config
         self.connected = False
 
+        self.business_logger = logging.getLogger("business")
+        self.executor = ThreadPoolExecutor(max_workers=config.get('max_workers', 2))
+
+        # 进行中的查询：相同SQL的并发请求共享同一个Future（single-flight）
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+
+        # 结果缓存：相同SQL在TTL内直接返回上次结果，避免重复的集群往返
+        self._result_cache = LRUCache(
+            maxsize=config.get('result_cache_size', 512),
+            ttl=config.get('cache_ttl_seconds', 300)
+        )
+
     @abstractmethod
     def connect(self) -> bool:
         """连接到执行引擎"""
@@ -27,11 +148,144 @@ class ExecutionEngine(ABC):
         """断开连接"""
         pass
 
-    @abstractmethod
     def execute_query(self, sql: str, task: DataTask) -> Dict[str, Any]:
-        """执行SQL查询"""
+        """
+        执行SQL查询（带结果缓存）
+
+        命中缓存时返回结果的浅拷贝，并标记 cache_hit=True；
+        配置 coalesce_queries=True 时，并发的相同查询只执行一次：
+        首个调用方在当前线程执行，其余调用方等待并各自得到带自身 task_id 的浅拷贝
+        """
+        sql = self._apply_row_limit(sql, task)
+        if not self.config.get('coalesce_queries', False):
+            return self._run_query(sql, task)
+
+        key = self._cache_key(sql)
+        shared, is_leader = self._join_inflight(key)
+        if is_leader:
+            self._run_shared(key, shared, sql, task)
+        return self._caller_result(shared.result(), task)
+
+    def execute_async(self, sql: str, task: DataTask, callback=None) -> Future:
+        """
+        异步执行查询
+
+        相同SQL正在执行时不会重复提交；每个调用方得到各自的Future，
+        结果为共享结果的浅拷贝，task_id 为调用方任务的ID
+        """
+        sql = self._apply_row_limit(sql, task)
+        key = self._cache_key(sql)
+
+        shared, is_leader = self._join_inflight(key)
+        if is_leader:
+            self.executor.submit(self._run_shared, key, shared, sql, task)
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def relay(done: Future):
+            error = done.exception()
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(self._caller_result(done.result(), task))
+
+        # 回调需在锁外注册：Future已完成时回调会在当前线程立即执行
+        shared.add_done_callback(relay)
+        if callback:
+            future.add_done_callback(lambda f: callback(f.result()))
+
+        return future
+
+    def _join_inflight(self, key: str) -> Tuple[Future, bool]:
+        """
+        加入进行中的查询（single-flight）
+
+        Returns:
+            tuple: (共享的Future, 是否由当前调用方负责执行)
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _run_shared(self, key: str, future: Future, sql: str, task: DataTask):
+        """执行查询并将结果写入共享的Future，完成后移除进行中的记录"""
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(self._run_query(sql, task))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    @staticmethod
+    def _caller_result(result: Dict[str, Any], task: DataTask) -> Dict[str, Any]:
+        """共享结果的浅拷贝，避免调用方之间互相修改；task_id 替换为调用方自己的任务ID"""
+        result = dict(result)
+        result['task_id'] = task.task_config.task_id
+        return result
+
+    def _run_query(self, sql: str, task: DataTask) -> Dict[str, Any]:
+        """查询结果缓存，未命中时调用具体引擎执行"""
+        if not self._is_cacheable(sql, task):
+            return self._execute_query(sql, task)
+
+        cache_key = self._cache_key(sql)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            result = dict(cached)
+            result['cache_hit'] = True
+            result['task_id'] = task.task_config.task_id
+            return result
+
+        result = self._execute_query(sql, task)
+        if result.get('success'):
+            self._result_cache.set(cache_key, result)
+        return result
+
+    @abstractmethod
+    def _execute_query(self, sql: str, task: DataTask) -> Dict[str, Any]:
+        """实际执行SQL查询（由具体引擎实现）"""
         pass
 
+    def _apply_row_limit(self, sql: str, task: DataTask) -> str:
+        """
+        在引擎端限制预览任务（task_config.preview）的返回行数，避免全表扫描与大量数据传输
+
+        限制为引擎配置 preview_limit 行（默认100）
+        """
+        if not getattr(task.task_config, 'preview', False):
+            return sql
+
+        limit = self.config.get('preview_limit', 100)
+        if not limit:
+            return sql
+
+        limited_sql = inject_limit(sql, limit)
+        if limited_sql != sql:
+            self.business_logger.info("自动限制返回行数: %s | LIMIT %s", task.task_config.task_id, limit)
+        return limited_sql
+
+    def _is_cacheable(self, sql: str, task: DataTask) -> bool:
+        """判断查询结果是否可以缓存，只缓存 SELECT / WITH 查询"""
+        if not getattr(task.task_config, 'cacheable', True):
+            return False
+        return statement_verb(sql) in _QUERY_VERBS
+
+    def _cache_key(self, sql: str) -> str:
+        """根据数据库和规范化后的SQL生成缓存键"""
+        normalized = f"{self.config.get('database', '')}|{_normalize_sql(sql)}"
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+    def clear_result_cache(self):
+        """清空结果缓存"""
+        self._result_cache.clear()
+
     @abstractmethod
     def execute_count_query(self, sql: str, task: DataTask) -> int:
         """执行计数查询"""
@@ -49,23 +303,17 @@ class ExecutionEngine(ABC):
 
 
 class EngineFactory:
-    """执行引擎工厂"""
-
-    _engines = {}
-
-    def __init_subclass__(cls, **kwargs):
-        super().__init_subclass__(**kwargs)
-        # 自动注册子类
-        pass
-
+    """执行引擎工厂，内置引擎在 execution 包导入时注册一次"""
 
-class EngineFactory:
-    _engines = {}
+    _engines: Dict[str, type] = {}
+    # 引擎类型 -> 构造函数，create_engine 只需一次字典查找
+    _factories: Dict[str, Callable[[Dict[str, Any]], 'ExecutionEngine']] = {}
 
     @classmethod
     def register_engine(cls, engine_type: str, engine_class):
-        """注册引擎类"""
-        cls._engines[engine_type] = engine_class
+        """注册引擎类，重复注册同一类型时保留首次注册的实现"""
+        cls._engines.setdefault(engine_type, engine_class)
+        cls._factories.setdefault(engine_type, engine_class)
 
     @classmethod
     def create_engine(cls, engine_type: str, config: Dict[str, Any]) -> ExecutionEngine:
@@ -79,11 +327,10 @@ class EngineFactory:
         Returns:
             ExecutionEngine: 执行引擎实例
         """
-        if engine_type not in cls._engines:
+        factory = cls._factories.get(engine_type)
+        if factory is None:
             raise ValueError(f"不支持的引擎类型: {engine_type}")
-
-        engine_class = cls._engines[engine_type]
-        return engine_class(config)
+        return factory(config)
 
     @classmethod
     def get_supported_engines(cls) -> list:
@@ -4,6 +4,8 @@ Hive执行引擎
 """
 
 import time
+import queue
+from contextlib import contextmanager
 from typing import Dict, Any, Optional
 
 try:
@@ -12,6 +14,18 @@ try:
 except ImportError:
     HIVE_AVAILABLE = False
 
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
 from .engine_factory import ExecutionEngine
 from ..task.task_builder import DataTask
 
@@ -22,25 +36,23 @@ class HiveEngine(ExecutionEngine):
     def __init__(self, config: Dict[str, Any]):
         """初始化Hive引擎"""
         super().__init__(config)
-        self.connection = None
+        # 连接池，元素为 (连接, 复用的游标)
+        self._pool: Optional[queue.Queue] = None
 
         if not HIVE_AVAILABLE:
             raise ImportError("PyHive不可用，请安装: pip install pyhive[hive]")
 
     def connect(self) -> bool:
-        """连接到Hive"""
+        """连接到Hive，按 pool_size（默认4）预建连接池"""
         try:
-            if self.connection:
-                self.connection.close()
-
-            self.connection = hive.Connection(
-                host=self.config.get('host', 'localhost'),
-                port=self.config.get('port', 10000),
-                username=self.config.get('username'),
-                password=self.config.get('password'),
-                auth_mechanism=self.config.get('auth_mechanism', 'PLAIN'),
-                database=self.config.get('database', 'default')
-            )
+            if self._pool is not None:
+                self._close_pool()
+
+            pool_size = self.config.get('pool_size', 4)
+            self._pool = queue.Queue(maxsize=pool_size)
+            for _ in range(pool_size):
+                connection = self._open_connection()
+                self._pool.put((connection, connection.cursor()))
 
             self.connected = True
             print("✅ Hive连接成功")
@@ -48,24 +60,101 @@ class HiveEngine(ExecutionEngine):
 
         except Exception as e:
             print(f"❌ Hive连接失败: {e}")
+            if self._pool is not None:
+                self._close_pool()
             self.connected = False
             return False
 
     def disconnect(self):
         """断开Hive连接"""
-        if self.connection:
+        if self._pool is not None:
             try:
-                self.connection.close()
+                self._close_pool()
                 print("✅ Hive连接已断开")
             except Exception as e:
                 print(f"⚠️ Hive断开连接时出错: {e}")
             finally:
-                self.connection = None
+                self._pool = None
                 self.connected = False
 
-    def execute_query(self, sql: str, task: DataTask) -> Dict[str, Any]:
+    def _open_connection(self):
+        """建立一个新的Hive连接"""
+        return hive.Connection(
+            host=self.config.get('host', 'localhost'),
+            port=self.config.get('port', 10000),
+            username=self.config.get('username'),
+            password=self.config.get('password'),
+            auth_mechanism=self.config.get('auth_mechanism', 'PLAIN'),
+            database=self.config.get('database', 'default')
+        )
+
+    def _close_pool(self):
+        """关闭连接池中当前空闲的连接，借出中的连接归还到已废弃的池后随之释放"""
+        pool, self._pool = self._pool, None
+        while True:
+            try:
+                connection, cursor = pool.get_nowait()
+            except queue.Empty:
+                break
+            if connection is None:
+                continue
+            try:
+                cursor.close()
+            finally:
+                connection.close()
+
+    @staticmethod
+    def _discard(connection, cursor):
+        """关闭出错的连接与游标，忽略关闭时的异常（连接可能已经断开）"""
+        for resource in (cursor, connection):
+            if resource is None:
+                continue
+            try:
+                resource.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def _borrow(self):
+        """
+        从连接池借出一个游标，退出时归还
+
+        游标在连接的生命周期内复用，省去每次查询打开/关闭Thrift游标的往返；
+        执行出错时关闭整个连接并归还空槽位 (None, None)，下次借出时重建，
+        避免把已断开的连接或状态不确定的游标放回池中
+        """
+        pool = self._pool
+        if pool is None:
+            raise RuntimeError("Hive未连接")
+
+        timeout = self.config.get('pool_timeout', 30)
+        try:
+            connection, cursor = pool.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"获取Hive连接超时: {timeout}秒内连接池没有空闲连接") from None
+
+        if connection is None:
+            try:
+                connection = self._open_connection()
+                cursor = connection.cursor()
+            except Exception:
+                if connection is not None:
+                    self._discard(connection, None)
+                pool.put((None, None))
+                raise
+
+        try:
+            yield cursor
+        except Exception:
+            self._discard(connection, cursor)
+            connection = cursor = None
+            raise
+        finally:
+            pool.put((connection, cursor))
+
+    def _execute_query(self, sql: str, task: DataTask) -> Dict[str, Any]:
         """执行SQL查询"""
-        if not self.connected or not self.connection:
+        if not self.connected or self._pool is None:
             return {
                 'success': False,
                 'error': 'Hive未连接',
@@ -77,24 +166,15 @@ class HiveEngine(ExecutionEngine):
         start_time = time.time()
 
         try:
-            cursor = self.connection.cursor()
-
-            # 执行查询
-            cursor.execute(sql)
-
-            # 获取结果
-            result_data = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+            with self._borrow() as cursor:
+                cursor.arraysize = self.config.get('fetch_batch', 10000)
 
-            # 转换为字典格式
-            data = []
-            for row in result_data:
-                row_dict = {}
-                for i, col in enumerate(columns):
-                    row_dict[col] = row[i]
-                data.append(row_dict)
+                # 执行查询
+                cursor.execute(sql)
 
-            cursor.close()
+                # 分批获取结果
+                columns = [desc[0] for desc in cursor.description] if cursor.description else []
+                data, data_format, row_count = self._fetch_rows(cursor, columns)
 
             execution_time = time.time() - start_time
 
@@ -103,7 +183,8 @@ class HiveEngine(ExecutionEngine):
                 'error': None,
                 'data': data,
                 'columns': columns,
-                'row_count': len(data),
+                'row_count': row_count,
+                'format': data_format,
                 'execution_time': execution_time,
                 'task_id': task.task_config.task_id
             }
@@ -124,16 +205,63 @@ class HiveEngine(ExecutionEngine):
                 'task_id': task.task_config.task_id
             }
 
+    def _fetch_rows(self, cursor, columns: list):
+        """
+        以 fetchmany 分批读取游标结果并转换为列式结构
+
+        每批行元组读取后立即转置追加到各列，避免 fetchall 的整表元组列表
+        与转换结果同时驻留内存。优先使用Arrow Table，其次pandas DataFrame；
+        配置 legacy_dict_rows=True 或两者都不可用时返回字典列表
+
+        Returns:
+            tuple: (数据, 格式标识 'arrow' | 'dataframe' | 'rows', 行数)
+        """
+        batch_size = cursor.arraysize
+        column_names = tuple(columns)
+
+        if self.config.get('legacy_dict_rows', False) or not (ARROW_AVAILABLE or PANDAS_AVAILABLE):
+            rows = []
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                rows.extend(dict(zip(column_names, row)) for row in batch)
+            return rows, 'rows', len(rows)
+
+        column_values = [[] for _ in column_names]
+        row_count = 0
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            row_count += len(batch)
+            for values, batch_column in zip(column_values, zip(*batch)):
+                values.extend(batch_column)
+
+        if ARROW_AVAILABLE:
+            try:
+                arrays = [pa.array(values) for values in column_values]
+                return pa.Table.from_arrays(arrays, names=list(column_names)), 'arrow', row_count
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # 列内类型混杂时无法推断Arrow类型，退回其他格式
+                pass
+
+        if PANDAS_AVAILABLE:
+            frame = pd.DataFrame(dict(enumerate(column_values)))
+            frame.columns = list(column_names)
+            return frame, 'dataframe', row_count
+
+        return [dict(zip(column_names, row)) for row in zip(*column_values)], 'rows', row_count
+
     def execute_count_query(self, sql: str, task: DataTask) -> int:
         """执行计数查询"""
-        if not self.connected or not self.connection:
+        if not self.connected or self._pool is None:
             return 0
 
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql)
-            result = cursor.fetchone()
-            cursor.close()
+            with self._borrow() as cursor:
+                cursor.execute(sql)
+                result = cursor.fetchone()
 
             return result[0] if result else 0
         except Exception as e:
@@ -142,14 +270,13 @@ class HiveEngine(ExecutionEngine):
 
     def get_status(self) -> Dict[str, Any]:
         """获取Hive状态"""
-        if not self.connection:
+        if self._pool is None:
             return {'connected': False}
 
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
+            with self._borrow() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
 
             return {
                 'connected': True,
@@ -167,32 +294,27 @@ class HiveEngine(ExecutionEngine):
 
     def list_databases(self) -> list:
         """列出所有数据库"""
-        if not self.connection:
+        if self._pool is None:
             return []
 
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SHOW DATABASES")
-            databases = [row[0] for row in cursor.fetchall()]
-            cursor.close()
+            with self._borrow() as cursor:
+                cursor.execute("SHOW DATABASES")
+                databases = [row[0] for row in cursor.fetchall()]
             return databases
         except Exception:
             return []
 
     def list_tables(self, database: Optional[str] = None) -> list:
         """列出数据库中的表"""
-        if not self.connection:
+        if self._pool is None:
             return []
 
         try:
-            cursor = self.connection.cursor()
-
-            if database:
-                cursor.execute(f"USE {database}")
-
-            cursor.execute("SHOW TABLES")
-            tables = [row[0] for row in cursor.fetchall()]
-            cursor.close()
+            with self._borrow() as cursor:
+                # 使用 SHOW TABLES IN 而非 USE，避免改变池化连接的当前数据库
+                cursor.execute(f"SHOW TABLES IN {database}" if database else "SHOW TABLES")
+                tables = [row[0] for row in cursor.fetchall()]
             return tables
         except Exception:
             return []
@@ -4,8 +4,8 @@ Spark执行引擎
 """
 
 import time
+from importlib.util import find_spec
 from typing import Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     from pyspark.sql import SparkSession
@@ -14,6 +14,10 @@ try:
 except ImportError:
     SPARK_AVAILABLE = False
 
+# pandas / pyarrow 只由PySpark内部使用，这里只需判断是否已安装
+PANDAS_AVAILABLE = find_spec('pandas') is not None
+ARROW_AVAILABLE = find_spec('pyarrow') is not None
+
 from .engine_factory import ExecutionEngine
 from ..task.task_builder import DataTask
 
@@ -25,7 +29,6 @@ class SparkEngine(ExecutionEngine):
         """初始化Spark引擎"""
         super().__init__(config)
         self.spark_session: Optional[SparkSession] = None
-        self.executor = ThreadPoolExecutor(max_workers=2)
 
         if not SPARK_AVAILABLE:
             raise ImportError("PySpark不可用，请安装pyspark: pip install pyspark")
@@ -68,8 +71,12 @@ class SparkEngine(ExecutionEngine):
             # 其他配置
             builder = builder \
                 .config('spark.sql.adaptive.enabled', 'true') \
+                .config('spark.scheduler.mode', self.config.get('scheduler_mode', 'FAIR')) \
                 .config('spark.sql.adaptive.coalescePartitions.enabled', 'true') \
-                .config('spark.serializer', 'org.apache.spark.serializer.KryoSerializer')
+                .config('spark.serializer', 'org.apache.spark.serializer.KryoSerializer') \
+                .config('spark.sql.execution.arrow.pyspark.enabled', 'true') \
+                .config('spark.sql.execution.arrow.maxRecordsPerBatch',
+                        str(self.config.get('arrow_max_records_per_batch', 20000)))
 
             self.spark_session = builder.getOrCreate()
             self.connected = True
@@ -94,7 +101,7 @@ class SparkEngine(ExecutionEngine):
                 self.spark_session = None
                 self.connected = False
 
-    def execute_query(self, sql: str, task: DataTask) -> Dict[str, Any]:
+    def _execute_query(self, sql: str, task: DataTask) -> Dict[str, Any]:
         """
         执行SQL查询
 
@@ -117,12 +124,8 @@ class SparkEngine(ExecutionEngine):
             df = self.spark_session.sql(sql)
 
             # 获取结果
-            # 注意：在生产环境中，应该考虑内存限制和分页
-            result_data = df.collect()
-
-            # 转换为字典格式
             columns = df.columns
-            data = [row.asDict() for row in result_data]
+            data, data_format, row_count, truncated = self._fetch_result(df)
 
             execution_time = time.time() - start_time
 
@@ -131,7 +134,9 @@ class SparkEngine(ExecutionEngine):
                 'error': None,
                 'data': data,
                 'columns': columns,
-                'row_count': len(data),
+                'row_count': row_count,
+                'truncated': truncated,
+                'format': data_format,
                 'execution_time': execution_time,
                 'task_id': task.task_config.task_id
             }
@@ -152,6 +157,54 @@ class SparkEngine(ExecutionEngine):
                 'task_id': task.task_config.task_id
             }
 
+    def _fetch_result(self, df):
+        """
+        将查询结果拉取到Driver端
+
+        PySpark 4.0+ 且pyarrow可用时以 toArrow() 收集为Arrow Table，不做逐行 asDict()；
+        否则使用 toPandas() 获取DataFrame（会话已开启 spark.sql.execution.arrow.pyspark.enabled，
+        按Arrow批量传输），配置 return_dicts=True 时转为字典列表；pandas不可用时退回 collect()。
+        配置 max_collect_rows 时先在Spark端 limit(max_collect_rows + 1)，Driver最多接收
+        max_collect_rows + 1 行，多出的一行只用于判断结果是否被截断
+
+        Returns:
+            tuple: (数据, 格式标识 'arrow' | 'dataframe' | 'rows', 行数, 是否被截断)
+        """
+        max_collect_rows = self.config.get('max_collect_rows')
+        if max_collect_rows is not None:
+            df = df.limit(max_collect_rows + 1)
+
+        data, data_format = self._collect(df)
+        row_count = data.num_rows if data_format == 'arrow' else len(data)
+
+        truncated = max_collect_rows is not None and row_count > max_collect_rows
+        if truncated:
+            if data_format == 'arrow':
+                data = data.slice(0, max_collect_rows)
+            elif data_format == 'dataframe':
+                data = data.iloc[:max_collect_rows]
+            else:
+                data = data[:max_collect_rows]
+            row_count = max_collect_rows
+
+        return data, data_format, row_count, truncated
+
+    def _collect(self, df):
+        """按可用的依赖收集查询结果，返回 (数据, 格式标识)"""
+        return_dicts = self.config.get('return_dicts', False)
+
+        if ARROW_AVAILABLE and not return_dicts and hasattr(df, 'toArrow'):
+            # PySpark 4.0+ 提供公开的toArrow()
+            return df.toArrow(), 'arrow'
+
+        if not PANDAS_AVAILABLE:
+            return [row.asDict() for row in df.collect()], 'rows'
+
+        pdf = df.toPandas()
+        if return_dicts:
+            return pdf.to_dict(orient='records'), 'rows'
+        return pdf, 'dataframe'
+
     def execute_count_query(self, sql: str, task: DataTask) -> int:
         """执行计数查询"""
         if not self.connected or not self.spark_session:
@@ -167,15 +220,6 @@ class SparkEngine(ExecutionEngine):
             print(f"计数查询失败: {e}")
             return 0
 
-    def execute_async(self, sql: str, task: DataTask, callback=None):
-        """异步执行查询"""
-        future = self.executor.submit(self.execute_query, sql, task)
-
-        if callback:
-            future.add_done_callback(lambda f: callback(f.result()))
-
-        return future
-
     def get_status(self) -> Dict[str, Any]:
         """获取Spark状态"""
         if not self.spark_session:
@@ -3,10 +3,21 @@
 识别用户查询的意图类型
 """
 
+import re
 import logging
+import threading
 from enum import Enum
-from typing import Dict, Any, Optional
-from dataclasses import dataclass
+from typing import Dict, Any, Optional, FrozenSet, Iterable
+from dataclasses import dataclass, field
+
+from ..utils.cache import LRUCache
+from ..utils.keyword_matcher import KeywordMatcher
+
+# 查询中的整数（取第一个作为限制数量）
+_NUM_RE = re.compile(r'\d+')
+
+# 由 _extract_parameters 转换为查询参数的标签类别
+_PARAMETER_KINDS = frozenset({'time', 'agg', 'entity'})
 
 
 class QueryIntent(Enum):
@@ -23,6 +34,21 @@ class QueryIntent(Enum):
     UNKNOWN = "unknown"              # 未知意图
 
 
+# 意图的中文描述
+_INTENT_DESC = {
+    QueryIntent.STATISTICS: "统计查询",
+    QueryIntent.ANALYSIS: "数据分析",
+    QueryIntent.TREND: "趋势分析",
+    QueryIntent.COMPARISON: "对比分析",
+    QueryIntent.FILTER: "数据筛选",
+    QueryIntent.AGGREGATION: "数据聚合",
+    QueryIntent.RANKING: "排名查询",
+    QueryIntent.DISTRIBUTION: "分布分析",
+    QueryIntent.CORRELATION: "相关性分析",
+    QueryIntent.UNKNOWN: "未知查询"
+}
+
+
 @dataclass
 class IntentResult:
     """意图识别结果"""
@@ -30,15 +56,42 @@ class IntentResult:
     confidence: float
     parameters: Dict[str, Any]
     raw_query: str
+    # 附加词表的命中情况：角色 -> 查询中出现的关键词集合
+    tag_hits: Dict[str, FrozenSet[str]] = field(default_factory=dict)
 
 
 class IntentRecognizer:
     """意图识别器类"""
 
-    def __init__(self):
-        """初始化意图识别器"""
+    # get_shared() 创建的共享实例，按附加词表区分
+    _shared: Dict[tuple, 'IntentRecognizer'] = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def get_shared(cls, tag_vocabulary: Optional[Dict[str, Iterable[str]]] = None) -> 'IntentRecognizer':
+        """获取共享实例，相同词表的调用方复用同一个已构建的关键词自动机和结果缓存"""
+        key = tuple(sorted((role, tuple(keywords)) for role, keywords in (tag_vocabulary or {}).items()))
+        with cls._shared_lock:
+            recognizer = cls._shared.get(key)
+            if recognizer is None:
+                recognizer = cls._shared[key] = cls(tag_vocabulary=tag_vocabulary)
+            return recognizer
+
+    def __init__(self, cache_size: int = 256,
+                 tag_vocabulary: Optional[Dict[str, Iterable[str]]] = None):
+        """
+        初始化意图识别器
+
+        Args:
+            cache_size: 识别结果缓存条目数
+            tag_vocabulary: 附加词表 {角色: 关键词列表}，与意图关键词在同一次扫描中匹配，
+                结果通过 IntentResult.tag_hits 返回
+        """
         self.logger = logging.getLogger(__name__)
-        """初始化意图识别器"""
+
+        # 识别结果缓存，键为原始查询字符串
+        self._cache = LRUCache(maxsize=cache_size)
+
         # 意图关键词映射
         self.intent_keywords = {
             QueryIntent.STATISTICS: [
@@ -81,6 +134,32 @@ class IntentRecognizer:
             '求和', '平均', '最大', '最小', '计数', '总计', '均值', '平均值'
         ]
 
+        # 实体关键词，按优先级排列
+        self.entity_keywords = [('用户', 'user'), ('订单', 'order'), ('商品', 'product')]
+
+        # 关键词自动机：一次扫描同时得到意图关键词与时间/聚合/实体标签
+        # 标签统一为 (类别, 意图/优先级/角色, 取值)
+        self.tag_vocabulary = {role: tuple(keywords) for role, keywords in (tag_vocabulary or {}).items()}
+        self._matcher = KeywordMatcher(self._keyword_tags())
+        self._kw_counts = {intent: len(keywords) for intent, keywords in self.intent_keywords.items()}
+        # 意图声明顺序，同分时靠前的意图优先
+        self._intent_order = {intent: order for order, intent in enumerate(self.intent_keywords)}
+
+    def _keyword_tags(self):
+        """生成关键词自动机的 (关键词, 标签) 序列"""
+        for intent, keywords in self.intent_keywords.items():
+            for keyword in keywords:
+                yield keyword.lower(), ('intent', intent, keyword)
+        for rank, keyword in enumerate(self.time_keywords):
+            yield keyword.lower(), ('time', rank, keyword)
+        for rank, keyword in enumerate(self.aggregation_keywords):
+            yield keyword.lower(), ('agg', rank, keyword)
+        for rank, (keyword, entity) in enumerate(self.entity_keywords):
+            yield keyword.lower(), ('entity', rank, entity)
+        for role, keywords in self.tag_vocabulary.items():
+            for keyword in keywords:
+                yield keyword.lower(), ('tag', role, keyword)
+
     def recognize_intent(self, query: str) -> IntentResult:
         """
         识别查询意图
@@ -89,23 +168,33 @@ class IntentRecognizer:
             query: 用户查询字符串
 
         Returns:
-            IntentResult: 意图识别结果
+            IntentResult: 意图识别结果（可能来自缓存，调用方不应修改）
         """
+        cached = self._cache.get(query)
+        if cached is not None:
+            return cached
+
         self.logger.debug(f"开始识别意图: '{query}'")
         query_lower = query.lower()
 
-        # 计算每个意图的匹配分数
-        intent_scores = {}
-        for intent, keywords in self.intent_keywords.items():
-            score = 0
-            for keyword in keywords:
-                if keyword.lower() in query_lower:
-                    score += 1
-            intent_scores[intent] = score
+        # 计算每个意图的匹配分数（命中的不同关键词个数）
+        hits = self._matcher.find(query_lower)
+        intent_scores = dict.fromkeys(self.intent_keywords, 0)
+        tag_hits = {}
 
-        # 找到最高分的意图
-        best_intent = max(intent_scores, key=intent_scores.get)
-        confidence = intent_scores[best_intent] / max(1, len(self.intent_keywords[best_intent]))
+        # 累加得分的同时跟踪最高分的意图（命中集合无序，同分按声明顺序决定）
+        intent_order = self._intent_order
+        best_intent = next(iter(self.intent_keywords))
+        best_score = 0
+        for kind, key, value in hits:
+            if kind == 'intent':
+                score = intent_scores[key] = intent_scores[key] + 1
+                if score > best_score or (score == best_score and intent_order[key] < intent_order[best_intent]):
+                    best_intent, best_score = key, score
+            elif kind == 'tag':
+                tag_hits.setdefault(key, set()).add(value)
+
+        confidence = best_score / max(1, self._kw_counts[best_intent])
 
         # 如果没有匹配到任何关键词，默认使用统计意图
         if confidence == 0:
@@ -114,63 +203,64 @@ class IntentRecognizer:
             self.logger.debug("未匹配到关键词，使用默认统计意图")
 
         # 提取参数
-        parameters = self._extract_parameters(query)
+        parameters = self._extract_parameters(query, hits)
 
         self.logger.info(f"意图识别完成: {best_intent.value} (置信度: {confidence:.2f})")
         self.logger.debug(f"意图得分详情: {intent_scores}")
 
-        return IntentResult(
+        result = IntentResult(
             intent=best_intent,
             confidence=min(confidence, 1.0),
             parameters=parameters,
-            raw_query=query
+            raw_query=query,
+            tag_hits={role: frozenset(keywords) for role, keywords in tag_hits.items()}
         )
+        self._cache.set(query, result)
+        return result
+
+    def invalidate(self):
+        """清空识别结果缓存（关键词配置变更后调用）"""
+        self._cache.clear()
+
+    def _extract_parameters(self, query: str, hits: Optional[set] = None) -> Dict[str, Any]:
+        """
+        提取查询参数
+
+        Args:
+            query: 用户查询字符串
+            hits: recognize_intent 已得到的关键词标签集合，未提供时重新扫描
+        """
+        if hits is None:
+            hits = self._matcher.find(query.lower())
+
+        # 每个类别取关键词列表中最靠前的命中项
+        best = {}
+        for kind, rank, value in hits:
+            if kind in _PARAMETER_KINDS and (kind not in best or rank < best[kind][0]):
+                best[kind] = (rank, value)
 
-    def _extract_parameters(self, query: str) -> Dict[str, Any]:
-        """提取查询参数"""
         parameters = {}
 
         # 提取时间相关参数
-        for time_kw in self.time_keywords:
-            if time_kw in query:
-                parameters['time_range'] = time_kw
-                break
+        if 'time' in best:
+            parameters['time_range'] = best['time'][1]
 
         # 提取聚合函数
-        for agg_kw in self.aggregation_keywords:
-            if agg_kw in query:
-                parameters['aggregation'] = agg_kw
-                break
+        if 'agg' in best:
+            parameters['aggregation'] = best['agg'][1]
 
         # 提取数字（可能表示限制数量）
-        import re
-        numbers = re.findall(r'\d+', query)
-        if numbers:
-            parameters['limit'] = int(numbers[0])
+        number = _NUM_RE.search(query)
+        if number:
+            parameters['limit'] = int(number.group())
 
         # 提取可能的字段名（简单识别）
         # 这里可以根据具体的数据模式进行更复杂的识别
-        if '用户' in query:
-            parameters['entity'] = 'user'
-        elif '订单' in query:
-            parameters['entity'] = 'order'
-        elif '商品' in query:
-            parameters['entity'] = 'product'
+        if 'entity' in best:
+            parameters['entity'] = best['entity'][1]
 
         return parameters
 
     def get_intent_description(self, intent: QueryIntent) -> str:
         """获取意图的中文描述"""
-        descriptions = {
-            QueryIntent.STATISTICS: "统计查询",
-            QueryIntent.ANALYSIS: "数据分析",
-            QueryIntent.TREND: "趋势分析",
-            QueryIntent.COMPARISON: "对比分析",
-            QueryIntent.FILTER: "数据筛选",
-            QueryIntent.AGGREGATION: "数据聚合",
-            QueryIntent.RANKING: "排名查询",
-            QueryIntent.DISTRIBUTION: "分布分析",
-            QueryIntent.CORRELATION: "相关性分析",
-            QueryIntent.UNKNOWN: "未知查询"
-        }
-        return descriptions.get(intent, "未知查询")
+        return _INTENT_DESC.get(intent, "未知查询")
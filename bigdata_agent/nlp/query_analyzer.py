@@ -3,24 +3,61 @@
 使用LLM将自然语言转换为结构化的数据处理任务
 """
 
+import re
+import copy
 import json
+from functools import cached_property
 from typing import Dict, Any, Optional, List
-from dataclasses import dataclass, asdict, field
-from datetime import datetime, timedelta
+from dataclasses import dataclass, field, replace
 
-import sys
-import os
 import logging
-from pathlib import Path
 
-# 添加项目根目录到路径
-project_root = Path(__file__).parent.parent.parent
-llms_path = project_root / "llms"
-if str(llms_path) not in sys.path:
-    sys.path.insert(0, str(llms_path))
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-from siliconflow_llm import SiliconFlowLLM
+from openai import OpenAIError
+
+from llms.siliconflow_llm import SiliconFlowLLM
 from .intent_recognizer import IntentRecognizer, IntentResult
+from ..utils.cache import LRUCache
+from ..utils.clock import local_dates
+
+# 查询中的整数（取第一个作为限制数量）
+_NUM_RE = re.compile(r'\d+')
+
+# 规则解析使用的词表，交给意图识别器在同一次扫描中匹配（见 IntentResult.tag_hits）
+_TAG_VOCABULARY = {
+    'condition_time': ('昨天', '今天', '最近7天', '过去一周'),
+    'group': ('分组', '按', 'group by'),
+    'group_field': ('省份', '城市', '日期', '时间'),
+    'agg_func': ('统计', '计数', '求和', '总计'),
+}
+
+_NO_HITS = frozenset()
+
+# 要求LLM直接返回JSON对象（OpenAI兼容的 response_format）
+_JSON_RESPONSE_FORMAT = {'type': 'json_object'}
+
+# LLM深度分析的系统提示词
+_ANALYSIS_SYSTEM_PROMPT = """
+你是一个大数据查询分析专家。请分析用户的自然语言查询，将其转换为结构化的数据处理任务。
+
+请以JSON格式返回以下信息：
+{
+  "data_entity": "识别的主要数据实体（用户、订单、商品等）",
+  "query_type": "查询类型（统计、分析、筛选、聚合等）",
+  "conditions": "查询条件描述",
+  "aggregations": "聚合操作描述",
+  "time_range": "时间范围描述",
+  "output_requirements": "输出要求描述",
+  "description": "简要描述这个查询的意图"
+}
+
+请确保返回有效的JSON格式。
+"""
 
 
 @dataclass
@@ -66,6 +103,22 @@ class OutputConfig:
     sort_order: str = "desc"  # asc, desc
 
 
+# 序列化字段（取值多为标量；IN 条件的 value 可能是列表，由 _to_plain 复制，无需asdict的递归deepcopy）
+_DATASOURCE_FIELDS = ('name', 'type', 'table', 'database', 'path')
+_CONDITION_FIELDS = ('field', 'operator', 'value', 'logical_op')
+_TIME_RANGE_FIELDS = ('start_date', 'end_date', 'relative_days')
+_OUTPUT_FIELDS = ('format', 'limit', 'sort_by', 'sort_order')
+
+
+def _to_plain(obj: Any, fields: tuple) -> Dict[str, Any]:
+    """按字段元组将dataclass实例转换为字典，列表/元组取值复制为新列表"""
+    plain = {}
+    for name in fields:
+        value = getattr(obj, name)
+        plain[name] = list(value) if isinstance(value, (list, tuple)) else value
+    return plain
+
+
 @dataclass
 class AnalyzedQuery:
     """解析后的查询结构"""
@@ -79,17 +132,78 @@ class AnalyzedQuery:
     description: str = ""
     confidence_score: float = 0.0
 
+    @cached_property
+    def as_dict(self) -> Dict[str, Any]:
+        """字典形式（首次访问时计算并缓存，解析结果应视为只读）"""
+        result = {
+            'original_query': self.original_query,
+            'intent': self.intent_result.intent.value,
+            'intent_confidence': self.intent_result.confidence,
+            'data_source': _to_plain(self.data_source, _DATASOURCE_FIELDS),
+            'conditions': [_to_plain(cond, _CONDITION_FIELDS) for cond in self.conditions],
+            'output_config': _to_plain(self.output_config, _OUTPUT_FIELDS),
+            'description': self.description,
+            'confidence_score': self.confidence_score
+        }
+
+        if self.aggregations:
+            # 容器字段复制一份，避免与解析结果共享可变对象
+            result['aggregations'] = {
+                'group_by': list(self.aggregations.group_by),
+                'aggregations': dict(self.aggregations.aggregations)
+            }
+
+        if self.time_range:
+            result['time_range'] = _to_plain(self.time_range, _TIME_RANGE_FIELDS)
+
+        return result
+
+    @cached_property
+    def summary(self) -> Dict[str, Any]:
+        """查询摘要（首次访问时计算并缓存，供结果元信息复用）"""
+        return {
+            'original_query': self.original_query,
+            'intent': self.intent_result.intent.value,
+            'data_source': self.data_source.table,
+            'has_conditions': bool(self.conditions),
+            'has_aggregations': self.aggregations is not None,
+            'confidence_score': self.confidence_score
+        }
+
+
+def _copy_analysis(analyzed_query: AnalyzedQuery, query: str) -> AnalyzedQuery:
+    """复制缓存的解析结果：嵌套对象深拷贝，original_query 使用本次的查询原文"""
+    intent_result, data_source, conditions, aggregations, time_range, output_config = copy.deepcopy((
+        analyzed_query.intent_result, analyzed_query.data_source, analyzed_query.conditions,
+        analyzed_query.aggregations, analyzed_query.time_range, analyzed_query.output_config
+    ))
+    # replace() 构造新实例，as_dict 等 cached_property 会按新内容重新计算
+    return replace(
+        analyzed_query, original_query=query, intent_result=intent_result, data_source=data_source,
+        conditions=conditions, aggregations=aggregations, time_range=time_range, output_config=output_config
+    )
+
 
 class QueryAnalyzer:
     """查询分析器"""
 
-    def __init__(self):
-        """初始化查询分析器"""
+    def __init__(self, cache_size: int = 2048, llm_skip_confidence: float = 0.8):
+        """
+        初始化查询分析器
+
+        Args:
+            cache_size: 分析结果缓存条目数，0表示不缓存
+            llm_skip_confidence: 意图置信度达到该值且识别出实体时跳过LLM深度分析
+        """
         self.logger = logging.getLogger(__name__)
-        self.intent_recognizer = IntentRecognizer()
+        self.intent_recognizer = IntentRecognizer.get_shared(_TAG_VOCABULARY)
+
+        # 分析结果缓存：同一天内相同查询（忽略多余空白）直接复用
+        self._analysis_cache = LRUCache(maxsize=cache_size)
+        self.llm_skip_confidence = llm_skip_confidence
 
         try:
-            self.llm = SiliconFlowLLM()
+            self.llm = SiliconFlowLLM.get_shared()
             self.logger.info("LLM初始化成功")
         except Exception as e:
             self.logger.warning(f"LLM初始化失败: {e}，将使用规则-based方法")
@@ -103,16 +217,37 @@ class QueryAnalyzer:
             '日志': DataSource(name='logs', type='hive', table='user_logs', database='default'),
         }
 
-    def analyze_query(self, query: str) -> AnalyzedQuery:
+    def analyze_query(self, query: str, force_llm: bool = False) -> AnalyzedQuery:
         """
         分析用户查询
 
         Args:
             query: 用户的自然语言查询
+            force_llm: 为True时忽略缓存并始终调用LLM深度分析
 
         Returns:
-            AnalyzedQuery: 解析后的结构化查询
+            AnalyzedQuery: 解析后的结构化查询（每次返回独立副本，调用方可自由修改）
         """
+        # 只归一化空白，不改变大小写：过滤值（如 'Active' 与 'active'）大小写敏感
+        # 相对时间条件依赖当天日期，缓存键包含日期以免跨天复用
+        cache_key = (" ".join(query.split()), local_dates().today)
+        if not force_llm:
+            cached = self._analysis_cache.get(cache_key)
+            if cached is not None:
+                self.logger.debug(f"命中查询分析缓存: '{query}'")
+                return _copy_analysis(cached, query)
+
+        analyzed_query = self._analyze_query(query, force_llm)
+        self._analysis_cache.set(cache_key, analyzed_query)
+        return _copy_analysis(analyzed_query, query)
+
+    def invalidate(self):
+        """清空分析结果与意图识别缓存（如重新加载 data_source_mapping 后调用）"""
+        self._analysis_cache.clear()
+        self.intent_recognizer.invalidate()
+
+    def _analyze_query(self, query: str, force_llm: bool = False) -> AnalyzedQuery:
+        """执行完整的查询分析（意图识别 + LLM深度分析 + 规则解析）"""
         self.logger.info(f"开始分析查询: '{query}'")
 
         # 首先进行意图识别
@@ -120,17 +255,95 @@ class QueryAnalyzer:
 
         self.logger.debug(f"意图识别结果: {intent_result.intent.value} (置信度: {intent_result.confidence:.2f})")
 
-        # 使用LLM进行深度分析
-        llm_analysis = self._llm_deep_analysis(query, intent_result)
+        # 意图明确且已识别出实体时，规则结果已足够，跳过LLM网络调用
+        if not force_llm and self._can_skip_llm(intent_result):
+            self.logger.debug("意图置信度足够，跳过LLM深度分析")
+            llm_analysis = self._rule_based_analysis(intent_result)
+        else:
+            # 使用LLM进行深度分析
+            llm_analysis = self._llm_deep_analysis(query, intent_result)
+
+        return self._build_analyzed_query(query, intent_result, llm_analysis)
 
+    def analyze_queries(self, queries: List[str]) -> List[AnalyzedQuery]:
+        """
+        批量分析查询，需要LLM深度分析的查询合并为一次 invoke_batch 调用
+
+        Args:
+            queries: 自然语言查询列表
+
+        Returns:
+            list: 与输入顺序一致的解析结果（每项均为独立副本）
+        """
+        today = local_dates().today
+        results: List[Optional[AnalyzedQuery]] = [None] * len(queries)
+        pending = []  # (下标, 缓存键, 意图识别结果)
+        duplicates = {}  # 批内重复查询的下标 -> 首次出现的下标
+        first_index = {}
+
+        for index, query in enumerate(queries):
+            cache_key = (" ".join(query.split()), today)
+            cached = self._analysis_cache.get(cache_key)
+            if cached is not None:
+                results[index] = cached
+            elif cache_key in first_index:
+                duplicates[index] = first_index[cache_key]
+            else:
+                first_index[cache_key] = index
+                pending.append((index, cache_key, self.intent_recognizer.recognize_intent(query)))
+
+        llm_items = [item for item in pending if not self._can_skip_llm(item[2])]
+        responses = {}
+        if llm_items and self.llm is not None:
+            user_prompts = [self._build_user_prompt(queries[index], intent_result)
+                            for index, _, intent_result in llm_items]
+            try:
+                batch = self.llm.invoke_batch(
+                    _ANALYSIS_SYSTEM_PROMPT, user_prompts,
+                    return_exceptions=True, response_format=_JSON_RESPONSE_FORMAT
+                )
+                responses = {item[0]: response for item, response in zip(llm_items, batch)}
+            except OpenAIError as e:
+                self.logger.warning("LLM批量分析失败: %s，将使用规则-based方法", e)
+
+        for index, cache_key, intent_result in pending:
+            response = responses.get(index)
+            if isinstance(response, OpenAIError):
+                self.logger.warning("LLM深度分析调用失败，使用规则分析结果: %s", response)
+                llm_analysis = self._rule_based_analysis(intent_result)
+            elif isinstance(response, Exception):
+                raise response
+            elif response is None:
+                llm_analysis = self._rule_based_analysis(intent_result)
+            else:
+                llm_analysis = self._parse_llm_response(response, intent_result)
+
+            analyzed_query = self._build_analyzed_query(queries[index], intent_result, llm_analysis)
+            self._analysis_cache.set(cache_key, analyzed_query)
+            results[index] = analyzed_query
+
+        for index, source_index in duplicates.items():
+            results[index] = results[source_index]
+
+        # 缓存中的对象不直接交给调用方，批内重复查询也各自得到独立副本
+        return [_copy_analysis(analyzed_query, query) for analyzed_query, query in zip(results, queries)]
+
+    def _can_skip_llm(self, intent_result: IntentResult) -> bool:
+        """意图置信度足够且已识别出实体时无需LLM深度分析"""
+        return (intent_result.confidence >= self.llm_skip_confidence
+                and bool(intent_result.parameters.get('entity')))
+
+    def _build_analyzed_query(self, query: str, intent_result: IntentResult,
+                              llm_analysis: Dict[str, Any]) -> AnalyzedQuery:
+        """根据意图识别与LLM分析结果解析出完整的查询结构"""
         # 解析数据源
         data_source = self._parse_data_source(query, llm_analysis)
 
         # 解析查询条件
-        conditions = self._parse_conditions(query, llm_analysis)
+        conditions = self._parse_conditions(query, llm_analysis, intent_result.tag_hits)
 
         # 解析聚合配置
-        aggregations = self._parse_aggregations(query, llm_analysis)
+        aggregations = self._parse_aggregations(query, llm_analysis, intent_result.tag_hits)
 
         # 解析时间范围
         time_range = self._parse_time_range(query, llm_analysis)
@@ -154,46 +367,57 @@ class QueryAnalyzer:
         )
 
     def _llm_deep_analysis(self, query: str, intent_result: IntentResult) -> Dict[str, Any]:
-        """使用LLM进行深度查询分析"""
-        system_prompt = """
-你是一个大数据查询分析专家。请分析用户的自然语言查询，将其转换为结构化的数据处理任务。
+        """使用LLM进行深度查询分析，LLM未初始化时使用规则分析"""
+        if self.llm is None:
+            return self._rule_based_analysis(intent_result)
 
-请以JSON格式返回以下信息：
-{
-  "data_entity": "识别的主要数据实体（用户、订单、商品等）",
-  "query_type": "查询类型（统计、分析、筛选、聚合等）",
-  "conditions": "查询条件描述",
-  "aggregations": "聚合操作描述",
-  "time_range": "时间范围描述",
-  "output_requirements": "输出要求描述",
-  "description": "简要描述这个查询的意图"
-}
-
-请确保返回有效的JSON格式。
-"""
-
-        user_prompt = f"""
+        try:
+            response = self.llm.invoke(
+                _ANALYSIS_SYSTEM_PROMPT,
+                self._build_user_prompt(query, intent_result),
+                response_format=_JSON_RESPONSE_FORMAT
+            )
+        except OpenAIError as e:
+            # 认证失败、服务端拒绝 response_format、网络错误等，记录后退回规则分析
+            self.logger.warning("LLM深度分析调用失败，使用规则分析结果: %s", e)
+            return self._rule_based_analysis(intent_result)
+        return self._parse_llm_response(response, intent_result)
+
+    def _build_user_prompt(self, query: str, intent_result: IntentResult) -> str:
+        """构造LLM深度分析的用户提示词"""
+        return f"""
 用户查询：{query}
 识别的意图：{intent_result.intent.value} (置信度: {intent_result.confidence:.2f})
 
 请分析这个查询并返回结构化信息。
 """
 
+    def _parse_llm_response(self, response: str, intent_result: IntentResult) -> Dict[str, Any]:
+        """解析LLM返回的JSON，无效时退回规则分析"""
         try:
-            response = self.llm.invoke(system_prompt, user_prompt)
-            # 尝试解析JSON响应
-            return json.loads(response.strip())
-        except (json.JSONDecodeError, Exception):
-            # 如果LLM返回的不是有效JSON，返回默认分析
-            return {
-                "data_entity": intent_result.parameters.get('entity', 'unknown'),
-                "query_type": intent_result.intent.value,
-                "conditions": "无特定条件",
-                "aggregations": "无聚合操作",
-                "time_range": intent_result.parameters.get('time_range'),
-                "output_requirements": "默认输出",
-                "description": f"{intent_result.intent.value}查询"
-            }
+            # 尝试解析JSON响应（两种解析器都能容忍首尾空白，无需strip；解析错误均为ValueError子类）
+            analysis = orjson.loads(response) if ORJSON_AVAILABLE else json.loads(response)
+        except (TypeError, ValueError) as e:
+            # 已通过 response_format 约束为JSON，这里只处理服务端未遵守约束等异常情况
+            self.logger.warning("LLM返回的不是有效JSON，使用规则分析结果: %s", e)
+            return self._rule_based_analysis(intent_result)
+
+        if not isinstance(analysis, dict):
+            self.logger.warning("LLM返回的JSON不是对象，使用规则分析结果: %s", type(analysis).__name__)
+            return self._rule_based_analysis(intent_result)
+        return analysis
+
+    def _rule_based_analysis(self, intent_result: IntentResult) -> Dict[str, Any]:
+        """根据意图识别结果构造与LLM分析相同结构的默认分析"""
+        return {
+            "data_entity": intent_result.parameters.get('entity', 'unknown'),
+            "query_type": intent_result.intent.value,
+            "conditions": "无特定条件",
+            "aggregations": "无聚合操作",
+            "time_range": intent_result.parameters.get('time_range'),
+            "output_requirements": "默认输出",
+            "description": f"{intent_result.intent.value}查询"
+        }
 
     def _parse_data_source(self, query: str, llm_analysis: Dict[str, Any]) -> DataSource:
         """解析数据源"""
@@ -209,55 +433,64 @@ class QueryAnalyzer:
             name='default', type='hive', table='default_table', database='default'
         ))
 
-    def _parse_conditions(self, query: str, llm_analysis: Dict[str, Any]) -> List[QueryCondition]:
-        """解析查询条件"""
+    def _parse_conditions(self, query: str, llm_analysis: Dict[str, Any],
+                          tag_hits: Optional[Dict[str, frozenset]] = None) -> List[QueryCondition]:
+        """解析查询条件，tag_hits 为意图识别得到的词表命中情况，未提供时重新识别"""
+        if tag_hits is None:
+            tag_hits = self.intent_recognizer.recognize_intent(query).tag_hits
         conditions = []
         conditions_desc = llm_analysis.get('conditions', '')
 
         # 简单的时间条件解析
-        if '昨天' in query:
+        time_hits = tag_hits.get('condition_time', _NO_HITS)
+        dates = local_dates()
+        if '昨天' in time_hits:
             conditions.append(QueryCondition(
                 field='date',
                 operator='=',
-                value=(datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+                value=dates.yesterday
             ))
-        elif '今天' in query:
+        elif '今天' in time_hits:
             conditions.append(QueryCondition(
                 field='date',
                 operator='=',
-                value=datetime.now().strftime('%Y-%m-%d')
+                value=dates.today
             ))
-        elif '最近7天' in query or '过去一周' in query:
-            start_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        elif '最近7天' in time_hits or '过去一周' in time_hits:
             conditions.append(QueryCondition(
                 field='date',
                 operator='>=',
-                value=start_date
+                value=dates.week_ago
             ))
 
         return conditions
 
-    def _parse_aggregations(self, query: str, llm_analysis: Dict[str, Any]) -> Optional[AggregationConfig]:
-        """解析聚合配置"""
+    def _parse_aggregations(self, query: str, llm_analysis: Dict[str, Any],
+                            tag_hits: Optional[Dict[str, frozenset]] = None) -> Optional[AggregationConfig]:
+        """解析聚合配置，tag_hits 为意图识别得到的词表命中情况，未提供时重新识别"""
+        if tag_hits is None:
+            tag_hits = self.intent_recognizer.recognize_intent(query).tag_hits
         aggregations_desc = llm_analysis.get('aggregations', '')
 
-        if '分组' in query or '按' in query or 'group by' in query.lower():
+        if tag_hits.get('group'):
             # 简单的聚合解析
             group_by = []
             aggregations = {}
+            field_hits = tag_hits.get('group_field', _NO_HITS)
+            func_hits = tag_hits.get('agg_func', _NO_HITS)
 
             # 识别分组字段
-            if '省份' in query:
+            if '省份' in field_hits:
                 group_by.append('province')
-            elif '城市' in query:
+            elif '城市' in field_hits:
                 group_by.append('city')
-            elif '日期' in query or '时间' in query:
+            elif '日期' in field_hits or '时间' in field_hits:
                 group_by.append('date')
 
             # 识别聚合函数
-            if '统计' in query or '计数' in query:
+            if '统计' in func_hits or '计数' in func_hits:
                 aggregations['count'] = 'count(*)'
-            elif '求和' in query or '总计' in query:
+            elif '求和' in func_hits or '总计' in func_hits:
                 aggregations['total'] = 'sum(amount)'
 
             if group_by or aggregations:
@@ -273,9 +506,10 @@ class QueryAnalyzer:
         time_desc = llm_analysis.get('time_range') or llm_analysis.get('conditions', '')
 
         if '昨天' in time_desc:
+            yesterday = local_dates().yesterday
             return TimeRange(
-                start_date=(datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'),
-                end_date=(datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+                start_date=yesterday,
+                end_date=yesterday
             )
         elif '最近7天' in time_desc or '过去一周' in time_desc:
             return TimeRange(
@@ -294,16 +528,16 @@ class QueryAnalyzer:
 
         requirements = llm_analysis.get('output_requirements', '')
 
-        if '图表' in requirements or 'chart' in requirements.lower():
+        requirements_lower = requirements.lower()
+        if '图表' in requirements or 'chart' in requirements_lower:
             config.format = 'chart'
-        elif 'csv' in requirements.lower():
+        elif 'csv' in requirements_lower:
             config.format = 'csv'
 
         # 解析限制数量
-        import re
-        numbers = re.findall(r'\d+', query)
-        if numbers:
-            config.limit = int(numbers[0])
+        number = _NUM_RE.search(query)
+        if number:
+            config.limit = int(number.group())
 
         return config
 
@@ -324,22 +558,5 @@ class QueryAnalyzer:
         return min(intent_confidence + llm_boost, 1.0)
 
     def to_dict(self, analyzed_query: AnalyzedQuery) -> Dict[str, Any]:
-        """将解析结果转换为字典"""
-        result = {
-            'original_query': analyzed_query.original_query,
-            'intent': analyzed_query.intent_result.intent.value,
-            'intent_confidence': analyzed_query.intent_result.confidence,
-            'data_source': asdict(analyzed_query.data_source),
-            'conditions': [asdict(cond) for cond in analyzed_query.conditions],
-            'output_config': asdict(analyzed_query.output_config),
-            'description': analyzed_query.description,
-            'confidence_score': analyzed_query.confidence_score
-        }
-
-        if analyzed_query.aggregations:
-            result['aggregations'] = asdict(analyzed_query.aggregations)
-
-        if analyzed_query.time_range:
-            result['time_range'] = asdict(analyzed_query.time_range)
-
-        return result
+        """将解析结果转换为字典（返回缓存字典的浅拷贝，嵌套值仍应视为只读）"""
+        return dict(analyzed_query.as_dict)
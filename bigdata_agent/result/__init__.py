@@ -3,7 +3,7 @@
 处理执行结果并提供多种输出格式
 """
 
-from .result_processor import ResultProcessor
-from .formatters import JSONFormatter, CSVFormatter, ChartFormatter, TableFormatter
+from .result_processor import ResultProcessor, to_json_bytes
+from .formatters import JSONFormatter, ColumnarJSONFormatter, CSVFormatter, ChartFormatter, TableFormatter
 
-__all__ = ['ResultProcessor', 'JSONFormatter', 'CSVFormatter', 'ChartFormatter', 'TableFormatter']
+__all__ = ['ResultProcessor', 'to_json_bytes', 'JSONFormatter', 'ColumnarJSONFormatter', 'CSVFormatter', 'ChartFormatter', 'TableFormatter']
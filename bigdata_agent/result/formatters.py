@@ -5,13 +5,128 @@
 
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List
-import json
+import csv
+import io
+from operator import itemgetter, methodcaller
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
 
 from ..nlp.query_analyzer import AnalyzedQuery
 
 
+def to_records(data: Any) -> List[Dict]:
+    """
+    将执行结果数据统一转换为行字典列表
+
+    支持字典列表、Arrow Table/RecordBatch（to_pylist）和pandas DataFrame
+    """
+    if data is None:
+        return []
+    if isinstance(data, list):
+        return data
+    if hasattr(data, 'to_pylist'):
+        return data.to_pylist()
+    if hasattr(data, 'to_dict'):
+        return data.to_dict(orient='records')
+    return list(data)
+
+
+def column_names(data: Any) -> List[str]:
+    """获取列式数据（Arrow Table / DataFrame）的列名"""
+    if hasattr(data, 'column_names'):
+        return list(data.column_names)
+    if hasattr(data, 'columns'):
+        return [str(col) for col in data.columns]
+    return []
+
+
+def _bar_colors(i: int) -> tuple:
+    """柱状图第i个数据集的 (填充色, 边框色)"""
+    return (f'rgba({54 + i*30}, {162 - i*20}, {235 - i*10}, 0.6)',
+            f'rgba({54 + i*30}, {162 - i*20}, {235 - i*10}, 1)')
+
+
+def _line_colors(i: int) -> tuple:
+    """线图第i个数据集的 (线条色, 填充色)"""
+    return (f'rgba({75 + i*20}, {192 - i*15}, {192 - i*10}, 1)',
+            f'rgba({75 + i*20}, {192 - i*15}, {192 - i*10}, 0.2)')
+
+
+# 饼图最多扇区数，超过时降级为表格
+_PIE_MAX_SLICES = 20
+
+# 导入时预先生成的调色板，超出范围的下标按同一公式现算
+_PALETTE_SIZE = 32
+_BAR_PALETTE = tuple(_bar_colors(i) for i in range(_PALETTE_SIZE))
+_LINE_PALETTE = tuple(_line_colors(i) for i in range(_PALETTE_SIZE))
+# 饼图颜色按黄金角度分割色相
+_PIE_PALETTE = tuple(f'hsl({(i * 137.5) % 360}, 70%, 50%)' for i in range(_PIE_MAX_SLICES))
+
+
+def column_values(data: List[Dict], columns: List[str]) -> List[list]:
+    """
+    一次遍历取出多列的值，返回与columns对应的列表
+
+    首列缺失时抛出KeyError；其余列缺失时取0
+    """
+    try:
+        rows = list(map(itemgetter(*columns), data))
+        if len(columns) == 1:
+            return [rows]
+    except KeyError:
+        first, rest = columns[0], columns[1:]
+        rows = [(row[first], *(row.get(col, 0) for col in rest)) for row in data]
+
+    if not rows:
+        return [[] for _ in columns]
+    return [list(values) for values in zip(*rows)]
+
+
+def is_columnar(data: Any) -> bool:
+    """判断数据是否为列式结构（Arrow Table / DataFrame）"""
+    return not isinstance(data, list) and (hasattr(data, 'column_names') or hasattr(data, 'columns'))
+
+
+def columnar_values(data: Any, columns: List[str]) -> List[list]:
+    """
+    从列式数据中按列取值，语义与 column_values 一致
+
+    首列缺失时抛出KeyError；其余列缺失时整列取0
+    """
+    names = set(column_names(data))
+    row_count = len(data)
+    result = []
+    for i, col in enumerate(columns):
+        if col not in names:
+            if i == 0:
+                raise KeyError(col)
+            result.append([0] * row_count)
+            continue
+        column = data.column(col) if hasattr(data, 'column') else data[col]
+        result.append(column.to_pylist() if hasattr(column, 'to_pylist') else column.tolist())
+    return result
+
+
 class ResultFormatter(ABC):
-    """结果格式化器抽象基类"""
+    """
+    结果格式化器抽象基类
+
+    accepts_columnar 为True的格式化器可以直接处理Arrow Table/DataFrame，
+    否则ResultProcessor会先将数据转换为行字典列表
+    """
+
+    accepts_columnar = False
 
     @abstractmethod
     def format(self, data: List[Dict], columns: List[str],
@@ -21,14 +136,62 @@ class ResultFormatter(ABC):
 
 
 class JSONFormatter(ResultFormatter):
-    """JSON格式化器"""
+    """JSON格式化器，列式数据在C层（to_pylist / to_dict）一次性转换为行字典"""
+
+    accepts_columnar = True
+
+    def format(self, data: List[Dict], columns: List[str],
+              analyzed_query: AnalyzedQuery, keep_arrow: bool = False,
+              **kwargs) -> Dict[str, Any]:
+        """
+        格式化为JSON结构
+
+        Args:
+            keep_arrow: 数据为Arrow Table时不转换行字典，以 arrow_table 字段保留原表，
+                由分页、导出等下游按需取行
+        """
+        if keep_arrow and ARROW_AVAILABLE and isinstance(data, pa.Table):
+            body = {'columns': columns, 'arrow_table': data}
+        else:
+            body = {'columns': columns, 'rows': to_records(data)}
+        return {
+            **body,
+            'summary': {
+                'total_rows': len(data),
+                'query_type': analyzed_query.intent_result.intent.value,
+                'confidence': analyzed_query.confidence_score
+            }
+        }
+
+
+class ColumnarJSONFormatter(ResultFormatter):
+    """
+    列式JSON格式化器
+
+    按列输出取值列表 {"columns": [...], "data": [[列1取值...], [列2取值...]]}，
+    不构建逐行字典；Arrow Table / DataFrame 直接按列转换
+    """
+
+    accepts_columnar = True
 
     def format(self, data: List[Dict], columns: List[str],
               analyzed_query: AnalyzedQuery, **kwargs) -> Dict[str, Any]:
-        """格式化为JSON结构"""
+        """格式化为列式JSON结构，缺失的列取None"""
+        if is_columnar(data):
+            columns = columns or column_names(data)
+            names = set(column_names(data))
+            row_count = len(data)
+            values = [columnar_values(data, [col])[0] if col in names else [None] * row_count
+                      for col in columns]
+        else:
+            data = to_records(data)
+            if not columns and data:
+                columns = list(data[0].keys())
+            values = [list(map(methodcaller('get', col), data)) for col in columns]
+
         return {
             'columns': columns,
-            'rows': data,
+            'data': values,
             'summary': {
                 'total_rows': len(data),
                 'query_type': analyzed_query.intent_result.intent.value,
@@ -38,64 +201,120 @@ class JSONFormatter(ResultFormatter):
 
 
 class CSVFormatter(ResultFormatter):
-    """CSV格式化器"""
+    """
+    CSV格式化器
+
+    Arrow Table 直接由 pyarrow.csv 写出，DataFrame 及超过 pandas_min_rows 行的
+    字典列表由 pandas.to_csv 写出，小结果集使用标准库csv避免构建DataFrame的开销
+    """
+
+    accepts_columnar = True
+    pandas_min_rows = 1000
+    # 分块写出的行数
+    chunk_rows = 10_000
 
     def format(self, data: List[Dict], columns: List[str],
-              analyzed_query: AnalyzedQuery, **kwargs) -> str:
-        """格式化为CSV字符串"""
+              analyzed_query: AnalyzedQuery, out=None, **kwargs):
+        """
+        格式化为CSV
+
+        Args:
+            out: 可写的文本流，提供时按块直接写入out并返回out，不在内存中拼接完整的CSV字符串
+
+        Returns:
+            str: 未提供out时返回CSV字符串
+        """
+        sink = out if out is not None else io.StringIO()
+        self._write(data, columns, sink)
+        return out if out is not None else sink.getvalue()
+
+    def _write(self, data: Any, columns: List[str], sink):
+        """将数据以CSV格式写入文本流，无数据时不写入任何内容"""
+        if ARROW_AVAILABLE and isinstance(data, (pa.Table, pa.RecordBatch)):
+            if data.num_rows == 0:
+                return
+            if isinstance(data, pa.RecordBatch):
+                data = pa.Table.from_batches([data])
+            for i, batch in enumerate(data.to_batches(max_chunksize=self.chunk_rows)):
+                buffer = io.BytesIO()
+                pa_csv.write_csv(batch, buffer, write_options=pa_csv.WriteOptions(include_header=(i == 0)))
+                sink.write(buffer.getvalue().decode('utf-8'))
+            return
+
+        if PANDAS_AVAILABLE and isinstance(data, pd.DataFrame):
+            if not data.empty:
+                data.to_csv(sink, index=False, lineterminator='\r\n', chunksize=self.chunk_rows)
+            return
+
+        data = to_records(data)
         if not data:
-            return ""
-
-        import io
-        output = io.StringIO()
+            return
 
         # 如果没有指定列，使用数据中的键
         if not columns:
             columns = list(data[0].keys()) if data else []
 
+        if PANDAS_AVAILABLE and len(data) > self.pandas_min_rows:
+            # object dtype 保留原始值（缺失值不会把整数列转成浮点）
+            frame = pd.DataFrame(data, columns=columns, dtype=object)
+            frame.to_csv(sink, index=False, lineterminator='\r\n', chunksize=self.chunk_rows)
+            return
+
         # 写入CSV
-        import csv
-        writer = csv.DictWriter(output, fieldnames=columns)
+        writer = csv.DictWriter(sink, fieldnames=columns)
         writer.writeheader()
         writer.writerows(data)
 
-        return output.getvalue()
-
 
 class TableFormatter(ResultFormatter):
-    """表格格式化器"""
+    """表格格式化器，列式数据按列计算列宽"""
+
+    accepts_columnar = True
 
     def format(self, data: List[Dict], columns: List[str],
               analyzed_query: AnalyzedQuery, **kwargs) -> Dict[str, Any]:
         """格式化为表格结构"""
-        if not columns and data:
-            columns = list(data[0].keys())
+        columnar = is_columnar(data)
+        if columnar:
+            names = set(column_names(data))
+            columns = columns or column_names(data)
+        else:
+            data = to_records(data)
+            if not columns and data:
+                columns = list(data[0].keys())
 
-        # 计算列宽
+        # 计算列宽（取值、转字符串、求长度均在C层的map链中完成）
         column_widths = {}
         for col in columns:
-            max_width = len(col)
-            for row in data:
-                value_str = str(row.get(col, ''))
-                max_width = max(max_width, len(value_str))
-            column_widths[col] = min(max_width, 50)  # 最大宽度限制
+            if not columnar:
+                values = map(methodcaller('get', col, ''), data)
+            elif col in names:
+                values = columnar_values(data, [col])[0]
+            else:
+                values = ()
+            max_width = max(map(len, map(str, values)), default=0)
+            column_widths[col] = min(max(len(col), max_width), 50)  # 最大宽度限制
 
         return {
             'type': 'table',
             'columns': columns,
-            'rows': data,
+            'rows': to_records(data),
             'column_widths': column_widths,
             'total_rows': len(data)
         }
 
 
 class ChartFormatter(ResultFormatter):
-    """图表格式化器"""
+    """图表格式化器，列式数据按列直接取值，不经过行字典"""
+
+    accepts_columnar = True
 
     def format(self, data: List[Dict], columns: List[str],
               analyzed_query: AnalyzedQuery, **kwargs) -> Dict[str, Any]:
         """格式化为图表配置"""
-        if not data:
+        if not is_columnar(data):
+            data = to_records(data)
+        if len(data) == 0:
             return {'type': 'chart', 'data': [], 'error': '无数据'}
 
         intent = analyzed_query.intent_result.intent.value
@@ -121,16 +340,16 @@ class ChartFormatter(ResultFormatter):
             return self._create_table_chart(data, columns)
 
         # 假设第一列是标签，其他列是数值
-        labels = [row[columns[0]] for row in data]
+        labels, *series = self._series(data, columns)
         datasets = []
 
-        for i, col in enumerate(columns[1:], 1):
-            values = [row.get(col, 0) for row in data]
+        for i, (col, values) in enumerate(zip(columns[1:], series), 1):
+            background, border = _BAR_PALETTE[i] if i < _PALETTE_SIZE else _bar_colors(i)
             datasets.append({
                 'label': col,
                 'data': values,
-                'backgroundColor': f'rgba({54 + i*30}, {162 - i*20}, {235 - i*10}, 0.6)',
-                'borderColor': f'rgba({54 + i*30}, {162 - i*20}, {235 - i*10}, 1)',
+                'backgroundColor': background,
+                'borderColor': border,
                 'borderWidth': 1
             })
 
@@ -156,16 +375,17 @@ class ChartFormatter(ResultFormatter):
             return self._create_table_chart(data, columns)
 
         # 假设第一列是时间/X轴
-        labels = [str(row[columns[0]]) for row in data]
+        labels, *series = self._series(data, columns)
+        labels = list(map(str, labels))
         datasets = []
 
-        for i, col in enumerate(columns[1:], 1):
-            values = [row.get(col, 0) for row in data]
+        for i, (col, values) in enumerate(zip(columns[1:], series), 1):
+            border, background = _LINE_PALETTE[i] if i < _PALETTE_SIZE else _line_colors(i)
             datasets.append({
                 'label': col,
                 'data': values,
-                'borderColor': f'rgba({75 + i*20}, {192 - i*15}, {192 - i*10}, 1)',
-                'backgroundColor': f'rgba({75 + i*20}, {192 - i*15}, {192 - i*10}, 0.2)',
+                'borderColor': border,
+                'backgroundColor': background,
                 'tension': 0.1
             })
 
@@ -186,18 +406,15 @@ class ChartFormatter(ResultFormatter):
 
     def _create_pie_chart(self, data: List[Dict], columns: List[str]) -> Dict[str, Any]:
         """创建饼图配置"""
-        if len(columns) < 2 or len(data) > 20:  # 饼图不适合太多数据
+        if len(columns) < 2 or len(data) > _PIE_MAX_SLICES:  # 饼图不适合太多数据
             return self._create_table_chart(data, columns)
 
         # 使用前两个列：标签和数值
-        labels = [str(row[columns[0]]) for row in data]
-        values = [row.get(columns[1], 0) for row in data]
+        labels, values = self._series(data, columns[:2])
+        labels = list(map(str, labels))
 
         # 生成颜色
-        colors = []
-        for i in range(len(data)):
-            hue = (i * 137.5) % 360  # 黄金角度分割
-            colors.append(f'hsl({hue}, 70%, 50%)')
+        colors = list(_PIE_PALETTE[:len(data)])
 
         return {
             'type': 'pie',
@@ -219,11 +436,18 @@ class ChartFormatter(ResultFormatter):
             }
         }
 
+    @staticmethod
+    def _series(data: Any, columns: List[str]) -> List[list]:
+        """按列取值，列式数据直接读取整列"""
+        if is_columnar(data):
+            return columnar_values(data, columns)
+        return column_values(data, columns)
+
     def _create_table_chart(self, data: List[Dict], columns: List[str]) -> Dict[str, Any]:
         """创建表格图表（降级方案）"""
         return {
             'type': 'table',
-            'data': data,
+            'data': to_records(data),
             'columns': columns,
             'message': '数据已转换为表格格式'
         }
@@ -5,43 +5,135 @@
 
 import json
 import csv
-import io
-from typing import Dict, Any, List, Optional, Union
-from datetime import datetime
+import itertools
+from collections.abc import Iterator
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 from ..nlp.query_analyzer import AnalyzedQuery
+from ..utils.cache import LRUCache
+from ..utils.clock import iso_now
+from .formatters import (
+    to_records, column_names, ResultFormatter,
+    JSONFormatter, ColumnarJSONFormatter, CSVFormatter, ChartFormatter, TableFormatter
+)
+
+
+# 输出格式 -> 格式化器类
+_FORMATTER_CLASSES = MappingProxyType({
+    'json': JSONFormatter,
+    'json_columns': ColumnarJSONFormatter,
+    'csv': CSVFormatter,
+    'chart': ChartFormatter,
+    'table': TableFormatter
+})
+
+# 查询意图 -> 前端图表类型
+_CHART_MAPPING = MappingProxyType({
+    'statistics': 'bar',
+    'trend': 'line',
+    'comparison': 'bar',
+    'distribution': 'pie',
+    'ranking': 'bar',
+    'correlation': 'scatter'
+})
+
+# 分页结果原样保留的顶层字段：agent附加的查询元信息、结果缓存命中标记、批量查询中的序号
+_PAGINATION_PASSTHROUGH_KEYS = ('query_info', 'cache_hit', 'batch_index')
+
+
+def _json_default(obj: Any) -> Any:
+    """JSON序列化兜底：Arrow Table等列式数据转换为行字典，其余对象转为字符串"""
+    if hasattr(obj, 'to_pylist'):
+        return obj.to_pylist()
+    return str(obj)
+
+
+def to_json_bytes(obj: Any, indent: bool = False) -> bytes:
+    """
+    将处理结果序列化为UTF-8编码的JSON字节
+
+    安装orjson时使用其C实现，调用方可直接写入socket或二进制文件，
+    避免先生成str再编码的开销；否则回退到标准库json
+
+    Args:
+        obj: 待序列化的对象（process_result / generate_chart_config 的返回值等）
+        indent: 是否以2空格缩进输出
+
+    Returns:
+        bytes: JSON字节串
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_json_default, option=option)
+    return json.dumps(
+        obj, ensure_ascii=False, indent=2 if indent else None, default=_json_default
+    ).encode('utf-8')
 
 
 class ResultProcessor:
     """结果处理器"""
 
-    def __init__(self):
-        """初始化结果处理器"""
-        from .formatters import JSONFormatter, CSVFormatter, ChartFormatter, TableFormatter
+    # 流式导出CSV时每块的行数
+    export_chunk_rows = 10_000
 
-        self.formatters = {
-            'json': JSONFormatter(),
-            'csv': CSVFormatter(),
-            'chart': ChartFormatter(),
-            'table': TableFormatter()
-        }
+    def __init__(self, page_cache_size: int = 1024):
+        """
+        初始化结果处理器，格式化器在首次使用时创建
+
+        Args:
+            page_cache_size: 分页结果缓存的最大条目数，0表示不缓存
+        """
+        self.formatters: Dict[str, ResultFormatter] = {}
+        # (task_id, 输出格式, 页码, 每页大小, 游标列, 游标) -> 分页后的数据
+        self._page_cache = LRUCache(maxsize=page_cache_size)
+
+    def _get_formatter(self, name: str) -> ResultFormatter:
+        """获取格式化器，未知格式使用JSON格式化器"""
+        formatter = self.formatters.get(name)
+        if formatter is None:
+            if name not in _FORMATTER_CLASSES:
+                return self._get_formatter('json')
+            formatter = self.formatters[name] = _FORMATTER_CLASSES[name]()
+        return formatter
 
     def process_result(self, execution_result: Dict[str, Any],
                       analyzed_query: AnalyzedQuery,
                       output_format: str = 'json',
+                      now: Optional[str] = None,
                       **kwargs) -> Dict[str, Any]:
         """
         处理执行结果
 
         Args:
-            execution_result: 执行引擎返回的结果
+            execution_result: 执行引擎返回的结果，data可以是行字典列表、
+                Arrow Table或pandas DataFrame
             analyzed_query: 解析后的查询结构
-            output_format: 输出格式 (json, csv, chart, table)
+            output_format: 输出格式 (json, json_columns, csv, chart, table)
+            now: 结果时间戳（ISO字符串），批量处理时可由调用方统一传入
             **kwargs: 额外参数
 
         Returns:
             dict: 处理后的结果
         """
+        ts = now or iso_now()
+
         if not execution_result.get('success', False):
             # 执行失败，返回错误信息
             return {
@@ -49,18 +141,24 @@ class ResultProcessor:
                 'error': execution_result.get('error', '未知错误'),
                 'task_id': execution_result.get('task_id'),
                 'execution_time': execution_result.get('execution_time', 0),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': ts
             }
 
         # 获取对应的格式化器
-        formatter = self.formatters.get(output_format)
-        if not formatter:
-            formatter = self.formatters['json']
+        formatter = self._get_formatter(output_format)
+
+        # 执行结果数据可能是行字典列表，也可能是列式结构（Arrow Table / DataFrame）
+        data = execution_result.get('data')
+        if data is None:
+            data = []
+        columns = execution_result.get('columns') or column_names(data)
+        if not formatter.accepts_columnar:
+            data = to_records(data)
 
         # 处理数据
         processed_data = formatter.format(
-            data=execution_result.get('data', []),
-            columns=execution_result.get('columns', []),
+            data=data,
+            columns=columns,
             analyzed_query=analyzed_query,
             **kwargs
         )
@@ -71,10 +169,10 @@ class ResultProcessor:
             'data': processed_data,
             'metadata': {
                 'task_id': execution_result.get('task_id'),
-                'row_count': execution_result.get('row_count', 0),
+                'row_count': execution_result.get('row_count', len(data)),
                 'execution_time': execution_result.get('execution_time', 0),
                 'output_format': output_format,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': ts,
                 'query_summary': self._generate_query_summary(analyzed_query)
             }
         }
@@ -82,15 +180,8 @@ class ResultProcessor:
         return result
 
     def _generate_query_summary(self, analyzed_query: AnalyzedQuery) -> Dict[str, Any]:
-        """生成查询摘要"""
-        return {
-            'original_query': analyzed_query.original_query,
-            'intent': analyzed_query.intent_result.intent.value,
-            'data_source': analyzed_query.data_source.table,
-            'has_conditions': len(analyzed_query.conditions) > 0,
-            'has_aggregations': analyzed_query.aggregations is not None,
-            'confidence_score': analyzed_query.confidence_score
-        }
+        """生成查询摘要（缓存在解析结果上，同一查询的多次处理共享同一份摘要）"""
+        return analyzed_query.summary
 
     def export_result(self, processed_result: Dict[str, Any],
                      file_path: str,
@@ -120,26 +211,20 @@ class ResultProcessor:
                 format_type = 'json'
 
         try:
-            formatter = self.formatters.get(format_type, self.formatters['json'])
-
             # 获取原始数据
             data = processed_result.get('data', {})
 
             # 导出数据
-            with open(file_path, 'w', encoding='utf-8') as f:
-                if format_type == 'json':
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                elif format_type == 'csv':
-                    # CSV格式需要特殊处理
-                    if isinstance(data, dict) and 'rows' in data:
-                        writer = csv.DictWriter(f, fieldnames=data.get('columns', []))
-                        writer.writeheader()
-                        writer.writerows(data['rows'])
-                    elif isinstance(data, list) and data:
-                        if isinstance(data[0], dict):
-                            writer = csv.DictWriter(f, fieldnames=data[0].keys())
-                            writer.writeheader()
-                            writer.writerows(data)
+            if format_type == 'json':
+                # JSON以二进制写出，orjson生成的UTF-8字节无需再解码
+                with open(file_path, 'wb') as f:
+                    f.write(to_json_bytes(data, indent=True))
+            elif format_type == 'csv':
+                self._export_csv(data, file_path)
+            else:
+                # 其他格式没有可导出的文件内容，仅创建文件
+                with open(file_path, 'w', encoding='utf-8'):
+                    pass
 
             print(f"✅ 结果已导出到: {file_path}")
             return True
@@ -148,6 +233,90 @@ class ResultProcessor:
             print(f"❌ 导出失败: {e}")
             return False
 
+    def _export_csv(self, data: Any, file_path: str):
+        """
+        导出CSV文件
+
+        安装pyarrow时由 pyarrow.csv 的C++写出器直接写文件（行字典列表按 columns 的顺序逐列转换为Arrow Table，
+        缺失的键写为空值），否则逐行使用 csv.DictWriter。rows 为迭代器（生成器、RecordBatchReader）时按块流式写出
+
+        两种写出器的CSV方言不同：pyarrow 对所有字符串值加引号、行尾为 \\n，
+        csv.DictWriter 只在必要时加引号、行尾为 \\r\\n，两者都能被标准CSV解析器读回相同的内容。
+        两条路径都只写出 columns 中的列，行中多余的键被忽略
+        """
+        if isinstance(data, dict) and ('rows' in data or 'arrow_table' in data):
+            rows = data.get('arrow_table')
+            if rows is None:
+                rows = data['rows']
+            columns = list(data.get('columns', []))
+            if not columns and isinstance(rows, list) and rows and isinstance(rows[0], dict):
+                columns = list(rows[0].keys())
+        elif isinstance(data, list) and data and isinstance(data[0], dict):
+            rows = data
+            columns = list(data[0].keys())
+        else:
+            rows, columns = None, []
+
+        if isinstance(rows, Iterator) or (ARROW_AVAILABLE and isinstance(rows, pa.RecordBatchReader)):
+            self._export_csv_stream(rows, columns, file_path)
+            return
+
+        if ARROW_AVAILABLE and rows is not None and len(rows) > 0:
+            table = rows
+            try:
+                if isinstance(table, list):
+                    # 不使用 from_pylist：它只按第一行推断列，会丢弃后续行才出现的键
+                    table = pa.table({column: [row.get(column) for row in table] for column in columns})
+                elif columns and set(columns) <= set(table.column_names):
+                    table = table.select(columns)
+            except (pa.ArrowException, TypeError, ValueError):
+                # 同一列类型不一致等无法转换为Arrow的数据，退回标准库csv
+                table = None
+            if table is not None:
+                pa_csv.write_csv(table, file_path)
+                return
+
+        with open(file_path, 'w', encoding='utf-8', newline='') as f:
+            if rows is not None:
+                writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(to_records(rows))
+
+    def _export_csv_stream(self, rows: Any, columns: List[str], file_path: str):
+        """
+        流式导出CSV，峰值内存只与块大小有关
+
+        Arrow RecordBatch 流由 pyarrow.csv.CSVWriter 逐批写出；
+        行字典流每 export_chunk_rows 行写出一块并刷新文件
+        """
+        if ARROW_AVAILABLE and isinstance(rows, pa.RecordBatchReader):
+            with pa_csv.CSVWriter(file_path, rows.schema) as writer:
+                for batch in rows:
+                    writer.write_batch(batch)
+            return
+
+        first = next(rows, None)
+        if ARROW_AVAILABLE and isinstance(first, pa.RecordBatch):
+            with pa_csv.CSVWriter(file_path, first.schema) as writer:
+                writer.write_batch(first)
+                for batch in rows:
+                    writer.write_batch(batch)
+            return
+
+        if first is not None and not columns:
+            columns = list(first.keys())
+        rows = itertools.chain(() if first is None else (first,), rows)
+
+        with open(file_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            while True:
+                chunk = list(itertools.islice(rows, self.export_chunk_rows))
+                if not chunk:
+                    break
+                writer.writerows(chunk)
+                f.flush()
+
     def generate_chart_config(self, processed_result: Dict[str, Any],
                             analyzed_query: AnalyzedQuery) -> Dict[str, Any]:
         """
@@ -168,7 +337,7 @@ class ResultProcessor:
         config = {
             'type': chart_type,
             'data': data,
-            'title': f"{analyzed_query.intent_result.intent.value}结果",
+            'title': f"{intent}结果",
             'query': analyzed_query.original_query,
             'timestamp': processed_result.get('metadata', {}).get('timestamp')
         }
@@ -177,27 +346,29 @@ class ResultProcessor:
 
     def _determine_chart_type(self, intent: str, data: Any) -> str:
         """根据查询意图确定图表类型"""
-        chart_mapping = {
-            'statistics': 'bar',
-            'trend': 'line',
-            'comparison': 'bar',
-            'distribution': 'pie',
-            'ranking': 'bar',
-            'correlation': 'scatter'
-        }
-
-        return chart_mapping.get(intent, 'table')
+        return _CHART_MAPPING.get(intent, 'table')
 
     def paginate_result(self, processed_result: Dict[str, Any],
                        page: int = 1,
-                       page_size: int = 100) -> Dict[str, Any]:
+                       page_size: int = 100,
+                       key_column: Optional[str] = None,
+                       last_key: Any = None) -> Dict[str, Any]:
         """
         对结果进行分页
 
+        data 中提供 arrow_table（Arrow Table/RecordBatch）时按零拷贝切片取页，
+        只把当前页转换为行字典；否则对 rows 列表切片。
+
+        指定 key_column 时使用游标（keyset）分页：数据需按该列升序排列，
+        返回 last_key 之后的 page_size 行，并在 pagination.next_key 中给出下一页游标，
+        深翻页时无需按偏移量重新扫描前面的行。
+
         Args:
             processed_result: 处理后的结果
-            page: 页码（从1开始）
+            page: 页码（从1开始），游标分页时忽略
             page_size: 每页大小
+            key_column: 游标分页使用的排序列
+            last_key: 上一页最后一行的键值，为None时从第一行开始
 
         Returns:
             dict: 分页后的结果
@@ -205,48 +376,125 @@ class ResultProcessor:
         if not processed_result.get('success', False):
             return processed_result
 
-        data = processed_result.get('data', {})
+        # 同一任务结果的同一页重复请求时直接复用已切好的页
+        cache_key = self._page_cache_key(processed_result, page, page_size, key_column, last_key)
+        paginated_data = self._page_cache.get(cache_key) if cache_key is not None else None
+        if paginated_data is None:
+            paginated_data = self._paginate_data(
+                processed_result.get('data', {}), page, page_size, key_column, last_key)
+            if cache_key is not None:
+                self._page_cache.set(cache_key, paginated_data)
+
+        # 页数据取浅拷贝，调用方修改返回结果不会影响缓存中的页
+        if isinstance(paginated_data, dict):
+            paginated_data = dict(paginated_data)
+
+        # 直接构建返回结果，不复制整个processed_result
+        result = {
+            'success': True,
+            'data': paginated_data,
+            'metadata': processed_result.get('metadata')
+        }
+        for key in _PAGINATION_PASSTHROUGH_KEYS:
+            if key in processed_result:
+                result[key] = processed_result[key]
 
+        return result
+
+    @staticmethod
+    def _page_cache_key(processed_result: Dict[str, Any], page: int, page_size: int,
+                        key_column: Optional[str], last_key: Any) -> Optional[tuple]:
+        """分页缓存键，结果没有task_id或游标不可哈希时返回None（不缓存）"""
+        metadata = processed_result.get('metadata') or {}
+        task_id = metadata.get('task_id')
+        if task_id is None:
+            return None
+        key = (task_id, metadata.get('output_format'), page, page_size, key_column, last_key)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _paginate_data(self, data: Any, page: int, page_size: int,
+                       key_column: Optional[str], last_key: Any) -> Any:
+        """对结果数据切出一页"""
         # 处理不同数据格式
-        if isinstance(data, dict) and 'rows' in data:
+        if isinstance(data, dict) and ARROW_AVAILABLE and isinstance(
+                data.get('arrow_table'), (pa.Table, pa.RecordBatch)):
+            table = data['arrow_table']
+            total_count = table.num_rows
+            start_idx = self._page_start(table, page, page_size, key_column, last_key)
+            page_rows = table.slice(start_idx, page_size).to_pylist()
+            paginated_data = {
+                'columns': data.get('columns') or list(table.column_names),
+                'rows': page_rows,
+                'pagination': self._pagination_info(
+                    page_rows, start_idx, page, page_size, total_count, key_column)
+            }
+        elif isinstance(data, dict) and 'rows' in data:
             rows = data['rows']
             total_count = len(rows)
-            start_idx = (page - 1) * page_size
-            end_idx = start_idx + page_size
+            start_idx = self._page_start(rows, page, page_size, key_column, last_key)
+            page_rows = rows[start_idx:start_idx + page_size]
 
             paginated_data = {
                 'columns': data.get('columns', []),
-                'rows': rows[start_idx:end_idx],
-                'pagination': {
-                    'page': page,
-                    'page_size': page_size,
-                    'total_count': total_count,
-                    'total_pages': (total_count + page_size - 1) // page_size,
-                    'has_next': end_idx < total_count,
-                    'has_prev': page > 1
-                }
+                'rows': page_rows,
+                'pagination': self._pagination_info(
+                    page_rows, start_idx, page, page_size, total_count, key_column)
             }
         elif isinstance(data, list):
             total_count = len(data)
-            start_idx = (page - 1) * page_size
-            end_idx = start_idx + page_size
+            start_idx = self._page_start(data, page, page_size, key_column, last_key)
+            page_rows = data[start_idx:start_idx + page_size]
 
             paginated_data = {
-                'rows': data[start_idx:end_idx],
-                'pagination': {
-                    'page': page,
-                    'page_size': page_size,
-                    'total_count': total_count,
-                    'total_pages': (total_count + page_size - 1) // page_size,
-                    'has_next': end_idx < total_count,
-                    'has_prev': page > 1
-                }
+                'rows': page_rows,
+                'pagination': self._pagination_info(
+                    page_rows, start_idx, page, page_size, total_count, key_column)
             }
         else:
             # 其他格式不分页
             paginated_data = data
 
-        result = processed_result.copy()
-        result['data'] = paginated_data
-
-        return result
+        return paginated_data
+
+    @staticmethod
+    def _page_start(rows: Any, page: int, page_size: int,
+                    key_column: Optional[str], last_key: Any) -> int:
+        """计算当前页的起始行：偏移分页按页码计算，游标分页二分查找第一个大于last_key的行"""
+        if key_column is None:
+            return (page - 1) * page_size
+        if last_key is None:
+            return 0
+
+        if not isinstance(rows, list):
+            # Arrow数据已按key_column升序排列，小于等于last_key的行数即起始位置
+            return pc.sum(pc.less_equal(rows.column(key_column), last_key)).as_py() or 0
+
+        low, high = 0, len(rows)
+        while low < high:
+            mid = (low + high) // 2
+            if rows[mid][key_column] <= last_key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    @staticmethod
+    def _pagination_info(page_rows: List[Dict], start_idx: int, page: int, page_size: int,
+                         total_count: int, key_column: Optional[str]) -> Dict[str, Any]:
+        """生成分页信息"""
+        end_idx = start_idx + page_size
+        info = {
+            'page': page if key_column is None else start_idx // page_size + 1,
+            'page_size': page_size,
+            'total_count': total_count,
+            'total_pages': (total_count + page_size - 1) // page_size,
+            'has_next': end_idx < total_count,
+            'has_prev': start_idx > 0
+        }
+        if key_column is not None:
+            info['next_key'] = page_rows[-1][key_column] if info['has_next'] and page_rows else None
+        return info
@@ -4,12 +4,72 @@ SQL生成器
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import re
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
 from ..nlp.query_analyzer import AnalyzedQuery, DataSource, QueryCondition, AggregationConfig, TimeRange
 
 
+# 条件运算符到SQL运算符的映射，未知运算符按 = 处理
+_OPERATOR_MAP = {
+    '=': '=',
+    '>': '>',
+    '<': '<',
+    '>=': '>=',
+    '<=': '<=',
+    'like': 'LIKE',
+    'in': 'IN',
+    'between': 'BETWEEN'
+}
+
+
+def _format_in_value(value: Any) -> str:
+    """IN 条件的取值列表"""
+    if isinstance(value, list):
+        return f"({', '.join(map(repr, value))})"
+    return f"({value})"
+
+
+def _format_between_value(value: Any) -> str:
+    """BETWEEN 条件的上下界"""
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        return f"{value[0]} AND {value[1]}"
+    return str(value)
+
+
+# 按SQL运算符分派取值格式化函数，其余运算符使用 repr
+_VALUE_FORMATTERS = {
+    'IN': _format_in_value,
+    'BETWEEN': _format_between_value
+}
+
+
+# 不区分大小写地查找FROM关键字
+_FROM_RE = re.compile(r'\bFROM\b', re.IGNORECASE)
+
+
+def _from_qualified_table(data_source: DataSource) -> str:
+    """FROM子句：有库名时使用 库名.表名"""
+    if data_source.database:
+        return f"FROM {data_source.database}.{data_source.table}"
+    return f"FROM {data_source.table}"
+
+
+def _from_table(data_source: DataSource) -> str:
+    """FROM子句：只使用表名"""
+    return f"FROM {data_source.table}"
+
+
+# 各方言的FROM子句构建函数，Hive/Spark 使用库名限定表名
+_FROM_BUILDERS = {
+    'hive': _from_qualified_table,
+    'spark': _from_qualified_table,
+    'clickhouse': _from_table,
+    'presto': _from_table
+}
+
+
 class SQLGenerator:
     """SQL查询生成器"""
 
@@ -29,11 +89,7 @@ class SQLGenerator:
         Returns:
             str: 生成的SQL查询语句
         """
-        self.logger.info(f"开始生成SQL (方言: {dialect})")
-
-        if dialect not in self.supported_dialects:
-            self.logger.warning(f"不支持的方言 '{dialect}'，使用默认方言 'hive'")
-            dialect = 'hive'
+        dialect = self._resolve_dialect(dialect)
 
         # 构建SELECT子句
         select_clause = self._build_select_clause(analyzed_query)
@@ -44,6 +100,47 @@ class SQLGenerator:
         # 构建WHERE子句
         where_clause = self._build_where_clause(analyzed_query.conditions, analyzed_query.time_range)
 
+        return self._compose_query(analyzed_query, select_clause, from_clause, where_clause)
+
+    def build_all(self, analyzed_query: AnalyzedQuery, dialect: str = 'hive',
+                  sample_size: int = 10) -> Tuple[str, str, str]:
+        """
+        一次生成查询SQL、计数SQL和采样SQL
+
+        SELECT / FROM / WHERE 子句只构建一次，由三条SQL共享
+
+        Args:
+            analyzed_query: 解析后的查询结构
+            dialect: SQL方言 (hive, spark, clickhouse, presto)
+            sample_size: 采样SQL的行数
+
+        Returns:
+            tuple: (查询SQL, 计数SQL, 采样SQL)
+        """
+        dialect = self._resolve_dialect(dialect)
+
+        select_clause = self._build_select_clause(analyzed_query)
+        from_clause = self._build_from_clause(analyzed_query.data_source, dialect)
+        where_clause = self._build_where_clause(analyzed_query.conditions, analyzed_query.time_range)
+
+        return (
+            self._compose_query(analyzed_query, select_clause, from_clause, where_clause),
+            self._compose_count(from_clause, where_clause),
+            self._compose_sample(select_clause, from_clause, where_clause, sample_size)
+        )
+
+    def _resolve_dialect(self, dialect: str) -> str:
+        """校验方言，不支持的方言回退为hive"""
+        self.logger.info(f"开始生成SQL (方言: {dialect})")
+
+        if dialect not in self.supported_dialects:
+            self.logger.warning(f"不支持的方言 '{dialect}'，使用默认方言 'hive'")
+            dialect = 'hive'
+        return dialect
+
+    def _compose_query(self, analyzed_query: AnalyzedQuery, select_clause: str,
+                       from_clause: str, where_clause: Optional[str]) -> str:
+        """由已构建的子句组合完整查询SQL"""
         # 构建GROUP BY子句
         group_by_clause = self._build_group_by_clause(analyzed_query.aggregations)
 
@@ -53,18 +150,26 @@ class SQLGenerator:
         # 构建LIMIT子句
         limit_clause = self._build_limit_clause(analyzed_query.output_config)
 
-        # 组合完整SQL
-        sql_parts = [select_clause, from_clause]
-        if where_clause:
-            sql_parts.append(f"WHERE {where_clause}")
-        if group_by_clause:
-            sql_parts.append(f"GROUP BY {group_by_clause}")
-        if order_by_clause:
-            sql_parts.append(f"ORDER BY {order_by_clause}")
-        if limit_clause:
-            sql_parts.append(f"LIMIT {limit_clause}")
-
-        return " ".join(sql_parts)
+        # 单个f-string组合完整SQL：关键字与子句都作为独立片段，一次分配得到结果字符串
+        return (
+            f"{select_clause} {from_clause}"
+            f"{' WHERE ' if where_clause else ''}{where_clause or ''}"
+            f"{' GROUP BY ' if group_by_clause else ''}{group_by_clause or ''}"
+            f"{' ORDER BY ' if order_by_clause else ''}{order_by_clause or ''}"
+            f"{' LIMIT ' if limit_clause else ''}{limit_clause or ''}"
+        )
+
+    @staticmethod
+    def _compose_count(from_clause: str, where_clause: Optional[str]) -> str:
+        """由已构建的子句组合计数SQL"""
+        return f"SELECT COUNT(*) as total_count {from_clause}{' WHERE ' if where_clause else ''}{where_clause or ''}"
+
+    @staticmethod
+    def _compose_sample(select_clause: str, from_clause: str,
+                        where_clause: Optional[str], sample_size: int) -> str:
+        """由已构建的子句组合采样SQL"""
+        return (f"{select_clause} {from_clause}"
+                f"{' WHERE ' if where_clause else ''}{where_clause or ''} LIMIT {sample_size}")
 
     def _build_select_clause(self, analyzed_query: AnalyzedQuery) -> str:
         """构建SELECT子句"""
@@ -92,12 +197,7 @@ class SQLGenerator:
 
     def _build_from_clause(self, data_source: DataSource, dialect: str) -> str:
         """构建FROM子句"""
-        if data_source.database and dialect in ['hive', 'spark']:
-            table_ref = f"{data_source.database}.{data_source.table}"
-        else:
-            table_ref = data_source.table
-
-        return f"FROM {table_ref}"
+        return _FROM_BUILDERS.get(dialect, _from_table)(data_source)
 
     def _build_where_clause(self, conditions: List[QueryCondition],
                            time_range: Optional[TimeRange]) -> Optional[str]:
@@ -139,32 +239,8 @@ class SQLGenerator:
 
     def _condition_to_sql(self, condition: QueryCondition) -> str:
         """将查询条件转换为SQL"""
-        operator_map = {
-            '=': '=',
-            '>': '>',
-            '<': '<',
-            '>=': '>=',
-            '<=': '<=',
-            'like': 'LIKE',
-            'in': 'IN',
-            'between': 'BETWEEN'
-        }
-
-        op = operator_map.get(condition.operator, '=')
-
-        if op == 'IN':
-            if isinstance(condition.value, list):
-                value_str = f"({', '.join(repr(v) for v in condition.value)})"
-            else:
-                value_str = f"({condition.value})"
-        elif op == 'BETWEEN':
-            if isinstance(condition.value, (list, tuple)) and len(condition.value) == 2:
-                value_str = f"{condition.value[0]} AND {condition.value[1]}"
-            else:
-                value_str = str(condition.value)
-        else:
-            value_str = repr(condition.value)
-
+        op = _OPERATOR_MAP.get(condition.operator, '=')
+        value_str = _VALUE_FORMATTERS.get(op, repr)(condition.value)
         return f"{condition.field} {op} {value_str}"
 
     def _time_range_to_sql(self, time_range: TimeRange) -> Optional[str]:
@@ -191,11 +267,7 @@ class SQLGenerator:
         from_clause = self._build_from_clause(analyzed_query.data_source, dialect)
         where_clause = self._build_where_clause(analyzed_query.conditions, analyzed_query.time_range)
 
-        sql = f"SELECT COUNT(*) as total_count {from_clause}"
-        if where_clause:
-            sql += f" WHERE {where_clause}"
-
-        return sql
+        return self._compose_count(from_clause, where_clause)
 
     def generate_sample_sql(self, analyzed_query: AnalyzedQuery, sample_size: int = 10,
                            dialect: str = 'hive') -> str:
@@ -204,12 +276,7 @@ class SQLGenerator:
         from_clause = self._build_from_clause(analyzed_query.data_source, dialect)
         where_clause = self._build_where_clause(analyzed_query.conditions, analyzed_query.time_range)
 
-        sql = f"{select_clause} {from_clause}"
-        if where_clause:
-            sql += f" WHERE {where_clause}"
-
-        sql += f" LIMIT {sample_size}"
-        return sql
+        return self._compose_sample(select_clause, from_clause, where_clause, sample_size)
 
     def validate_sql(self, sql: str, dialect: str = 'hive') -> Dict[str, Any]:
         """
@@ -224,16 +291,14 @@ class SQLGenerator:
             'errors': []
         }
 
-        # 基础语法检查
-        sql_upper = sql.upper()
-
+        # 基础语法检查（只对开头6个字符做大小写转换，不复制整条SQL）
         # 检查是否有基本的SELECT语句
-        if not sql_upper.strip().startswith('SELECT'):
+        if sql.lstrip()[:6].upper() != 'SELECT':
             result['valid'] = False
             result['errors'].append('SQL必须以SELECT开头')
 
         # 检查是否有FROM子句
-        if 'FROM' not in sql_upper:
+        if not _FROM_RE.search(sql):
             result['valid'] = False
             result['errors'].append('缺少FROM子句')
 
@@ -3,16 +3,57 @@
 将分析结果和SQL组合成完整的执行任务
 """
 
-import uuid
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass, asdict
-from datetime import datetime
+import hashlib
+import itertools
+import logging
+import os
+import pickle
+import secrets
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Tuple
+from dataclasses import dataclass, field
 
 from ..nlp.query_analyzer import AnalyzedQuery
 from .sql_generator import SQLGenerator
-
-
-@dataclass
+from ..utils.cache import LRUCache
+from ..utils.clock import iso_now, local_dates
+
+
+# 任务ID = 进程级随机前缀 + 自增序号，进程内唯一，避免每个任务都读取系统随机源
+_TASK_PREFIX = secrets.token_hex(4)
+_TASK_SEQ = itertools.count()
+
+# 生成的SQL只在调试模式（未使用 python -O）或设置 BIGDATA_VALIDATE_SQL 环境变量时做语法自检
+_VALIDATE_SQL = __debug__ or bool(os.environ.get('BIGDATA_VALIDATE_SQL'))
+
+# 查询意图 -> 任务类型
+_TASK_TYPE_MAPPING = MappingProxyType({
+    'statistics': 'query',
+    'analysis': 'analysis',
+    'trend': 'analysis',
+    'comparison': 'analysis',
+    'filter': 'query',
+    'aggregation': 'aggregation',
+    'ranking': 'query',
+    'distribution': 'analysis',
+    'correlation': 'analysis'
+})
+
+# 各执行引擎的执行时间因子
+_ENGINE_FACTORS = MappingProxyType({
+    'spark': 1.0,
+    'hive': 1.5,
+    'clickhouse': 0.8,
+    'presto': 1.2
+})
+
+# Python 3.10+ 上任务相关数据类使用 __slots__，实例不再携带 __dict__
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class TaskConfig:
     """任务配置"""
     task_id: str
@@ -21,9 +62,11 @@ class TaskConfig:
     timeout_seconds: int = 3600  # 默认1小时超时
     retry_count: int = 0
     retry_delay: int = 60  # 重试间隔秒数
+    cacheable: bool = True  # 是否允许执行引擎缓存查询结果
+    preview: bool = False  # 预览任务，执行引擎会限制返回行数
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class ExecutionContext:
     """执行上下文"""
     engine_type: str = "spark"  # spark, hive, clickhouse, presto
@@ -41,7 +84,7 @@ class ExecutionContext:
             }
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class DataTask:
     """数据处理任务"""
     task_config: TaskConfig
@@ -52,36 +95,75 @@ class DataTask:
     sample_sql: Optional[str] = None
     created_at: str = ""
     status: str = "pending"  # pending, running, completed, failed, cancelled
+    # as_dict 的缓存（使用 __slots__ 时无法依赖 cached_property）
+    _as_dict: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if not self.created_at:
-            self.created_at = datetime.now().isoformat()
-
-    def to_dict(self) -> Dict[str, Any]:
-        """转换为字典格式"""
+            self.created_at = iso_now()
+
+    @property
+    def as_dict(self) -> Dict[str, Any]:
+        """任务的字典表示（不含会变化的 status），首次访问时计算并缓存"""
+        if self._as_dict is None:
+            self._as_dict = self._build_dict()
+        return self._as_dict
+
+    def _build_dict(self) -> Dict[str, Any]:
+        """构建任务的字典表示，嵌套的配置字典直接引用而不深拷贝"""
+        config = self.task_config
+        context = self.execution_context
         return {
-            'task_config': asdict(self.task_config),
-            'analyzed_query': self.analyzed_query.nlp.query_analyzer.to_dict(self.analyzed_query),
-            'execution_context': asdict(self.execution_context),
+            'task_config': {
+                'task_id': config.task_id,
+                'task_type': config.task_type,
+                'priority': config.priority,
+                'timeout_seconds': config.timeout_seconds,
+                'retry_count': config.retry_count,
+                'retry_delay': config.retry_delay,
+                'cacheable': config.cacheable,
+                'preview': config.preview
+            },
+            'analyzed_query': self.analyzed_query.as_dict,
+            'execution_context': {
+                'engine_type': context.engine_type,
+                'cluster_config': context.cluster_config,
+                'resource_limits': context.resource_limits
+            },
             'sql_query': self.sql_query,
             'count_sql': self.count_sql,
             'sample_sql': self.sample_sql,
-            'created_at': self.created_at,
-            'status': self.status
+            'created_at': self.created_at
         }
 
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        result = dict(self.as_dict)
+        result['status'] = self.status
+        return result
+
 
 class TaskBuilder:
     """任务构建器"""
 
-    def __init__(self):
-        """初始化任务构建器"""
+    def __init__(self, sql_cache_size: int = 1024):
+        """
+        初始化任务构建器
+
+        Args:
+            sql_cache_size: SQL生成结果缓存的最大条目数，0表示不缓存
+        """
+        self.logger = logging.getLogger(__name__)
         self.sql_generator = SQLGenerator()
+        # 查询结构摘要 -> (查询SQL, 计数SQL, 采样SQL)，开启验证时只缓存通过验证的结果
+        self._sql_cache = LRUCache(maxsize=sql_cache_size)
 
     def build_task(self, analyzed_query: AnalyzedQuery,
                   engine_type: str = "spark",
                   priority: int = 1,
-                  timeout_seconds: int = 3600) -> DataTask:
+                  timeout_seconds: int = 3600,
+                  preview: bool = False,
+                  created_at: Optional[str] = None) -> DataTask:
         """
         构建数据处理任务
 
@@ -90,19 +172,22 @@ class TaskBuilder:
             engine_type: 执行引擎类型
             priority: 任务优先级
             timeout_seconds: 超时时间
+            preview: 是否为预览任务（执行时限制返回行数）
+            created_at: 任务创建时间（ISO字符串），批量构建时由调用方统一传入
 
         Returns:
             DataTask: 完整的数据处理任务
         """
         # 生成任务ID
-        task_id = str(uuid.uuid4())
+        task_id = f"{_TASK_PREFIX}-{next(_TASK_SEQ):08x}"
 
         # 创建任务配置
         task_config = TaskConfig(
             task_id=task_id,
             task_type=self._determine_task_type(analyzed_query),
             priority=priority,
-            timeout_seconds=timeout_seconds
+            timeout_seconds=timeout_seconds,
+            preview=preview
         )
 
         # 创建执行上下文
@@ -112,19 +197,7 @@ class TaskBuilder:
             resource_limits=self._get_resource_limits(analyzed_query, engine_type)
         )
 
-        # 生成SQL查询
-        sql_query = self.sql_generator.generate_sql(analyzed_query, engine_type)
-
-        # 生成计数SQL（用于估算结果大小）
-        count_sql = self.sql_generator.generate_count_sql(analyzed_query, engine_type)
-
-        # 生成采样SQL（用于数据预览）
-        sample_sql = self.sql_generator.generate_sample_sql(analyzed_query, sample_size=5, dialect=engine_type)
-
-        # 验证SQL
-        validation_result = self.sql_generator.validate_sql(sql_query, engine_type)
-        if not validation_result['valid']:
-            raise ValueError(f"生成的SQL无效: {validation_result['errors']}")
+        sql_query, count_sql, sample_sql = self._generate_sqls(analyzed_query, engine_type)
 
         return DataTask(
             task_config=task_config,
@@ -132,27 +205,61 @@ class TaskBuilder:
             execution_context=execution_context,
             sql_query=sql_query,
             count_sql=count_sql,
-            sample_sql=sample_sql
+            sample_sql=sample_sql,
+            created_at=created_at or iso_now()
+        )
+
+    def _generate_sqls(self, analyzed_query: AnalyzedQuery,
+                       engine_type: str) -> Tuple[str, str, str]:
+        """生成并验证查询SQL、计数SQL和采样SQL，结构相同的查询直接复用缓存结果"""
+        cache_key = self._sql_cache_key(analyzed_query, engine_type)
+        if cache_key is not None:
+            cached = self._sql_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        # 一次生成查询SQL、计数SQL（用于估算结果大小）和采样SQL（用于数据预览）
+        sql_query, count_sql, sample_sql = self.sql_generator.build_all(
+            analyzed_query, engine_type, sample_size=5)
+
+        # 验证SQL
+        if _VALIDATE_SQL:
+            validation_result = self.sql_generator.validate_sql(sql_query, engine_type)
+            if not validation_result['valid']:
+                raise ValueError(f"生成的SQL无效: {validation_result['errors']}")
+
+        sqls = (sql_query, count_sql, sample_sql)
+        if cache_key is not None:
+            self._sql_cache.set(cache_key, sqls)
+        return sqls
+
+    @staticmethod
+    def _sql_cache_key(analyzed_query: AnalyzedQuery, engine_type: str) -> Optional[bytes]:
+        """
+        由影响SQL的查询结构计算缓存键
+
+        相对时间范围会展开为具体日期，因此键中包含当天日期；无法序列化时返回None（不缓存）
+        """
+        shape = (
+            engine_type,
+            local_dates().today,
+            analyzed_query.data_source,
+            analyzed_query.conditions,
+            analyzed_query.aggregations,
+            analyzed_query.time_range,
+            analyzed_query.output_config,
         )
+        try:
+            payload = pickle.dumps(shape, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+        return hashlib.blake2b(payload, digest_size=16).digest()
 
     def _determine_task_type(self, analyzed_query: AnalyzedQuery) -> str:
         """确定任务类型"""
         intent = analyzed_query.intent_result.intent.value
 
-        # 根据意图映射任务类型
-        type_mapping = {
-            'statistics': 'query',
-            'analysis': 'analysis',
-            'trend': 'analysis',
-            'comparison': 'analysis',
-            'filter': 'query',
-            'aggregation': 'aggregation',
-            'ranking': 'query',
-            'distribution': 'analysis',
-            'correlation': 'analysis'
-        }
-
-        return type_mapping.get(intent, 'query')
+        return _TASK_TYPE_MAPPING.get(intent, 'query')
 
     def _get_cluster_config(self, engine_type: str) -> Dict[str, Any]:
         """获取集群配置"""
@@ -229,33 +336,52 @@ class TaskBuilder:
 
     def build_batch_tasks(self, queries: List[str],
                          engine_type: str = "spark",
-                         priority: int = 1) -> List[DataTask]:
+                         priority: int = 1,
+                         max_workers: int = 4) -> List[DataTask]:
         """
         批量构建任务
 
+        查询分析通过 QueryAnalyzer.analyze_queries 一次完成（LLM请求在其中并发发出），
+        SQL生成与任务组装在线程池中并行进行
+
         Args:
             queries: 查询列表
             engine_type: 执行引擎类型
             priority: 任务优先级
+            max_workers: 构建任务的线程数
 
         Returns:
-            List[DataTask]: 任务列表
+            List[DataTask]: 任务列表，构建失败的查询被跳过
         """
         from ..nlp.query_analyzer import QueryAnalyzer
 
+        if not queries:
+            return []
+
         analyzer = QueryAnalyzer()
-        tasks = []
+        created_at = iso_now()
+
+        try:
+            analyzed_queries = analyzer.analyze_queries(queries)
+        except Exception as e:
+            self.logger.warning("批量分析查询失败: %s，逐条分析", e)
+            analyzed_queries = [None] * len(queries)
 
-        for query in queries:
+        def build(query: str, analyzed_query: Optional[AnalyzedQuery]) -> Optional[DataTask]:
             try:
-                analyzed_query = analyzer.analyze_query(query)
-                task = self.build_task(analyzed_query, engine_type, priority)
-                tasks.append(task)
+                if analyzed_query is None:
+                    analyzed_query = analyzer.analyze_query(query)
+                return self.build_task(analyzed_query, engine_type, priority,
+                                       created_at=created_at)
             except Exception as e:
-                print(f"构建任务失败: {query}, 错误: {e}")
-                continue
+                self.logger.warning("构建任务失败: %s, 错误: %s", query, e)
+                return None
 
-        return tasks
+        workers = max(1, min(len(queries), max_workers))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            built = list(executor.map(build, queries, analyzed_queries))
+
+        return [task for task in built if task is not None]
 
     def estimate_execution_time(self, task: DataTask) -> Dict[str, Any]:
         """
@@ -270,13 +396,7 @@ class TaskBuilder:
         complexity_factor = self._calculate_complexity(task.analyzed_query)
 
         # 引擎因子
-        engine_factors = {
-            'spark': 1.0,
-            'hive': 1.5,
-            'clickhouse': 0.8,
-            'presto': 1.2
-        }
-        engine_factor = engine_factors.get(task.execution_context.engine_type, 1.0)
+        engine_factor = _ENGINE_FACTORS.get(task.execution_context.engine_type, 1.0)
 
         # 资源因子（更多资源通常执行更快）
         resource_factor = 1.0
@@ -0,0 +1,10 @@
+"""
+通用工具模块
+提供缓存、关键词匹配等跨模块复用的基础组件
+"""
+
+from .cache import LRUCache
+from .clock import iso_now, local_dates, elapsed_seconds
+from .keyword_matcher import KeywordMatcher
+
+__all__ = ['LRUCache', 'iso_now', 'local_dates', 'elapsed_seconds', 'KeywordMatcher']
@@ -0,0 +1,55 @@
+"""
+时间工具
+提供低开销的时间戳与日期格式化
+"""
+
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import NamedTuple
+
+# (秒级时间戳, ISO字符串)，整体替换以保证多线程下读取一致
+_iso_cache = (0, '')
+
+
+class LocalDates(NamedTuple):
+    """本地日期字符串（YYYY-MM-DD）"""
+    today: str
+    yesterday: str
+    week_ago: str
+
+
+# (失效时间戳, LocalDates)，在本地次日零点失效
+_dates_cache = (0.0, None)
+
+
+def iso_now() -> str:
+    """当前UTC时间的ISO 8601字符串（秒级精度，同一秒内复用已格式化的结果）"""
+    global _iso_cache
+    second = int(time.time())
+    cached = _iso_cache
+    if cached[0] != second:
+        cached = (second, datetime.fromtimestamp(second, tz=timezone.utc).isoformat())
+        _iso_cache = cached
+    return cached[1]
+
+
+def local_dates() -> LocalDates:
+    """当天、昨天、7天前的本地日期字符串，跨过本地零点前复用同一结果"""
+    global _dates_cache
+    now = time.time()
+    valid_until, dates = _dates_cache
+    if dates is None or now >= valid_until:
+        today = date.fromtimestamp(now)
+        dates = LocalDates(
+            today=today.isoformat(),
+            yesterday=(today - timedelta(days=1)).isoformat(),
+            week_ago=(today - timedelta(days=7)).isoformat()
+        )
+        valid_until = datetime.combine(today + timedelta(days=1), dt_time.min).timestamp()
+        _dates_cache = (valid_until, dates)
+    return dates
+
+
+def elapsed_seconds(start_ns: int) -> float:
+    """根据 time.monotonic_ns() 起点计算经过的秒数"""
+    return (time.monotonic_ns() - start_ns) / 1e9
@@ -0,0 +1,97 @@
+"""
+多模式关键词匹配
+基于Aho-Corasick自动机，一次扫描找出文本中出现的全部关键词
+"""
+
+from typing import Any, Dict, Hashable, Iterable, List, Set, Tuple
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class KeywordMatcher:
+    """
+    关键词匹配器
+
+    每个关键词可以关联多个标签，find() 返回文本中出现过的所有关键词的标签集合。
+    安装 pyahocorasick 时使用其C实现，否则使用纯Python的自动机
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Hashable]]):
+        """
+        构建自动机
+
+        Args:
+            keywords: (关键词, 标签) 序列，同一关键词可出现多次以关联多个标签
+        """
+        tags_by_word: Dict[str, List[Hashable]] = {}
+        for word, tag in keywords:
+            if word:
+                tags_by_word.setdefault(word, []).append(tag)
+
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for word, tags in tags_by_word.items():
+                self._automaton.add_word(word, tuple(tags))
+            if tags_by_word:
+                self._automaton.make_automaton()
+            self._empty = not tags_by_word
+        else:
+            self._build(tags_by_word)
+
+    def _build(self, tags_by_word: Dict[str, List[Hashable]]):
+        """构建纯Python的goto/fail/output表"""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[Set[Hashable]] = [set()]
+
+        for word, tags in tags_by_word.items():
+            state = 0
+            for char in word:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    output.append(set())
+                state = next_state
+            output[state].update(tags)
+
+        # 按BFS顺序计算失败链接，并沿失败链接合并输出
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                output[next_state] |= output[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [frozenset(tags) for tags in output]
+
+    def find(self, text: str) -> Set[Any]:
+        """返回文本中出现的所有关键词的标签集合"""
+        hits: Set[Any] = set()
+
+        if AHOCORASICK_AVAILABLE:
+            if not self._empty:
+                for _, tags in self._automaton.iter(text):
+                    hits.update(tags)
+            return hits
+
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                hits |= output[state]
+        return hits
@@ -5,24 +5,23 @@
 """
 
 import sys
-import json
 import argparse
-from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-# 添加项目根目录到Python路径
-project_root = Path(__file__).parent.parent.parent
-sys.path.insert(0, str(project_root))
+# 以 python -m bigdata_agent.web.cli 运行时包已可导入，无需改动 sys.path；
+# 仅在直接执行本文件时补上项目根目录
+if not __package__:
+    from pathlib import Path
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-from bigdata_agent import BigDataAgent
+# 包的 __init__ 只包含版本信息和按需导入的导出对象，导入开销很小
+from bigdata_agent import __version__
 
+# Agent及其依赖（执行引擎、LLM客户端等）在 main() 中确认需要执行查询后才导入，
+# --help / --version / 参数错误时不加载
 
-def main():
-    """主函数"""
-    parser = argparse.ArgumentParser(
-        description="BigData Agent - 离线大数据处理智能代理",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+
+_EPILOG = """
 使用示例:
   # 基本查询
   python -m bigdata_agent.web.cli "统计昨天用户注册数"
@@ -39,12 +38,57 @@ def main():
   # 估算查询成本
   python -m bigdata_agent.web.cli "复杂分析查询" --estimate-cost
         """
+
+
+def _sniff_mode(argv: List[str]) -> str:
+    """
+    在构建参数解析器之前根据命令行参数判断运行模式
+
+    Returns:
+        str: help（显示帮助）、estimate、preview 或 query
+    """
+    if '-h' in argv or '--help' in argv:
+        return 'help'
+    if '--estimate-cost' in argv:
+        return 'estimate'
+    if '--preview' in argv:
+        return 'preview'
+    return 'query'
+
+
+def _mode_from_args(args: argparse.Namespace) -> str:
+    """根据解析后的参数确定运行模式（estimate、preview 或 query）"""
+    if args.estimate_cost:
+        return 'estimate'
+    if args.preview:
+        return 'preview'
+    return 'query'
+
+
+def _build_parser(mode: str) -> argparse.ArgumentParser:
+    """
+    构建指定模式的参数解析器
+
+    help 模式包含全部参数说明；其余模式只为本模式用到的参数构建完整的选项和帮助，
+    其他模式的参数仍然接受（保持命令行兼容），但会被忽略。
+    模式由 _sniff_mode 按完整选项名判断，因此不接受选项缩写（如 --estimate、--prev）
+    """
+    full = mode == 'help'
+    parser = argparse.ArgumentParser(
+        description="BigData Agent - 离线大数据处理智能代理",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG if full else None,
+        allow_abbrev=False
     )
 
     parser.add_argument('query', nargs='?', help='自然语言查询')
-    parser.add_argument('-f', '--format', choices=['json', 'csv', 'chart', 'table'],
-                       default='json', help='输出格式 (默认: json)')
-    parser.add_argument('-o', '--output', help='输出文件路径')
+    if full or mode == 'query':
+        parser.add_argument('-f', '--format', choices=['json', 'csv', 'chart', 'table'],
+                           default='json', help='输出格式 (默认: json)')
+        parser.add_argument('-o', '--output', help='输出文件路径')
+    else:
+        parser.add_argument('-f', '--format', default='json', help=argparse.SUPPRESS)
+        parser.add_argument('-o', '--output', help=argparse.SUPPRESS)
     parser.add_argument('-e', '--engine', choices=['spark', 'hive'],
                        default='spark', help='执行引擎 (默认: spark)')
     parser.add_argument('--preview', action='store_true',
@@ -54,100 +98,168 @@ def main():
     parser.add_argument('--config', help='配置文件路径')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='详细输出')
+    parser.add_argument('--version', action='version', version=f"BigData Agent {__version__}",
+                       help='显示版本号并退出')
+
+    return parser
+
+
+def _write_lines(lines: List[str]):
+    """将缓冲的输出行一次写入stdout"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def _run_estimate(agent, args):
+    """估算查询成本"""
+    if not args.query:
+        print("❌ 估算成本需要提供查询语句")
+        sys.exit(1)
+
+    # 耗时操作前的进度提示立即输出，结果行缓冲后一次写出
+    print(f"📊 估算查询成本: {args.query}", flush=True)
+    result = agent.estimate_query_cost(args.query)
 
-    args = parser.parse_args()
+    if result['success']:
+        estimation = result['estimation']
+        _write_lines([
+            "\n📈 成本估算结果:",
+            f"   预计执行时间: {estimation['estimated_minutes']:.1f} 分钟",
+            f"   复杂度因子: {estimation['complexity_factor']:.2f}",
+            f"   预估数据量: {estimation['estimated_row_count']} 行"
+        ])
+    else:
+        _write_lines([f"❌ 估算失败: {result['error']}"])
+
+
+def _run_preview(agent, args):
+    """预览查询"""
+    print(f"👀 预览查询: {args.query}", flush=True)
+    result = agent.preview_query(args.query)
+
+    lines = []
+    emit = lines.append
+    if result['success']:
+        preview_data = result.get('preview_data', {})
+        if isinstance(preview_data, dict) and 'rows' in preview_data:
+            rows = preview_data['rows']
+            emit(f"\n📋 预览数据 (前{len(rows)}行):")
+            if rows:
+                # 单元格用 str.ljust 补齐
+                headers = list(rows[0].keys())
+                emit(" | ".join(str(h).ljust(15) for h in headers))
+                emit("-" * (len(headers) * 18))
+                lines.extend(
+                    " | ".join(str(row.get(h, ''))[:15].ljust(15) for h in headers)
+                    for row in rows[:5]  # 只显示前5行
+                )
+        else:
+            emit(f"预览数据: {preview_data}")
+    else:
+        emit(f"❌ 预览失败: {result['error']}")
+    _write_lines(lines)
+
+
+def _run_query(agent, args):
+    """执行查询"""
+    print(f"🔍 执行查询: {args.query}", flush=True)
+    result = agent.query(args.query, output_format=args.format)
+
+    if not result['success']:
+        _write_lines([f"❌ 查询执行失败: {result.get('error', '未知错误')}"])
+        sys.exit(1)
+
+    lines = ["✅ 查询执行成功!"]
+
+    # 显示查询计划（Agent只把这些信息写入日志，面向用户的输出由CLI负责）
+    query_info = result.get('query_info')
+    if query_info:
+        analyzed = query_info['analyzed_query']
+        task_info = query_info['task_info']
+        lines += [
+            "\n🧭 查询计划:",
+            f"   识别意图: {analyzed['intent']} (置信度: {analyzed['intent_confidence']:.2f})",
+            f"   数据源: {analyzed['data_source'].get('table')}",
+            f"   任务ID: {task_info['task_config']['task_id']}",
+            f"   SQL: {task_info['sql_query'][:100]}"
+        ]
+
+    # 显示结果摘要
+    metadata = result.get('metadata', {})
+    lines += [
+        "\n📊 结果摘要:",
+        f"   数据行数: {metadata.get('row_count', 0)}",
+        f"   执行时间: {metadata.get('execution_time', 0):.2f}秒",
+        f"   输出格式: {args.format}"
+    ]
+
+    # 保存结果到文件
+    if args.output:
+        from bigdata_agent.result.result_processor import ResultProcessor
+        processor = ResultProcessor()
+
+        success = processor.export_result(result, args.output, args.format)
+        if success:
+            lines.append(f"💾 结果已保存到: {args.output}")
+        else:
+            lines.append("❌ 保存结果失败")
+        _write_lines(lines)
+
+    # 显示详细结果（如果不是保存到文件）
+    elif args.verbose:
+        lines.append("\n📄 详细结果:")
+        _write_lines(lines)
+        # 由orjson直接生成UTF-8字节写入stdout，不经过中间str
+        from bigdata_agent.result import to_json_bytes
+        sys.stdout.buffer.write(to_json_bytes(result, indent=True) + b"\n")
+        sys.stdout.buffer.flush()
+
+    else:
+        _write_lines(lines)
+
+
+# 运行模式 -> 处理函数
+_HANDLERS = {
+    'estimate': _run_estimate,
+    'preview': _run_preview,
+    'query': _run_query
+}
+
+
+def main(argv: Optional[List[str]] = None):
+    """主函数"""
+    if argv is None:
+        argv = sys.argv[1:]
+
+    mode = _sniff_mode(argv)
+    parser = _build_parser(mode)
+    args = parser.parse_args(argv)
 
     if not args.query and not args.estimate_cost:
-        parser.print_help()
+        _build_parser('help').print_help()
         return
 
+    # 面向用户的进度和结果由CLI输出到stdout；日志只用于诊断，
+    # 写入日志文件，指定 --verbose 时同时输出到stderr
+    from config.logging_config import setup_logging
+    setup_logging(level="DEBUG" if args.verbose else "INFO", enable_console=args.verbose)
+
+    from bigdata_agent import BigDataAgent
+
     try:
         # 初始化Agent
-        print("🚀 启动BigData Agent...")
+        print("🚀 启动BigData Agent...", flush=True)
         agent = BigDataAgent(engine_type=args.engine)
 
         # 连接执行引擎
-        print(f"🔌 连接到 {args.engine} 引擎...")
+        print(f"🔌 连接到 {args.engine} 引擎...", flush=True)
         if not agent.connect():
             print("❌ 无法连接到执行引擎")
             sys.exit(1)
+        print("✅ 执行引擎连接成功", flush=True)
 
         with agent:
-            if args.estimate_cost:
-                # 估算查询成本
-                if not args.query:
-                    print("❌ 估算成本需要提供查询语句")
-                    sys.exit(1)
-
-                print(f"📊 估算查询成本: {args.query}")
-                result = agent.estimate_query_cost(args.query)
-
-                if result['success']:
-                    estimation = result['estimation']
-                    print("\n📈 成本估算结果:"                    print(f"   预计执行时间: {estimation['estimated_minutes']:.1f} 分钟")
-                    print(f"   复杂度因子: {estimation['complexity_factor']:.2f}")
-                    print(f"   预估数据量: {estimation['estimated_row_count']} 行")
-                else:
-                    print(f"❌ 估算失败: {result['error']}")
-
-            elif args.preview:
-                # 预览查询
-                print(f"👀 预览查询: {args.query}")
-                result = agent.preview_query(args.query)
-
-                if result['success']:
-                    preview_data = result.get('preview_data', {})
-                    if isinstance(preview_data, dict) and 'rows' in preview_data:
-                        rows = preview_data['rows']
-                        print(f"\n📋 预览数据 (前{len(rows)}行):")
-                        if rows:
-                            # 打印表头
-                            headers = list(rows[0].keys())
-                            print(" | ".join(f"{h:<15}" for h in headers))
-                            print("-" * (len(headers) * 18))
-
-                            # 打印数据
-                            for row in rows[:5]:  # 只显示前5行
-                                values = [str(row.get(h, ''))[:15] for h in headers]
-                                print(" | ".join(f"{v:<15}" for v in values))
-                    else:
-                        print(f"预览数据: {preview_data}")
-                else:
-                    print(f"❌ 预览失败: {result['error']}")
-
-            else:
-                # 执行查询
-                print(f"🔍 执行查询: {args.query}")
-                result = agent.query(args.query, output_format=args.format)
-
-                if result['success']:
-                    print("✅ 查询执行成功!")
-
-                    # 显示结果摘要
-                    metadata = result.get('metadata', {})
-                    print("
-📊 结果摘要:"                    print(f"   数据行数: {metadata.get('row_count', 0)}")
-                    print(f"   执行时间: {metadata.get('execution_time', 0):.2f}秒")
-                    print(f"   输出格式: {args.format}")
-
-                    # 保存结果到文件
-                    if args.output:
-                        from bigdata_agent.result.result_processor import ResultProcessor
-                        processor = ResultProcessor()
-
-                        success = processor.export_result(result, args.output, args.format)
-                        if success:
-                            print(f"💾 结果已保存到: {args.output}")
-                        else:
-                            print("❌ 保存结果失败")
-
-                    # 显示详细结果（如果不是保存到文件）
-                    elif args.verbose:
-                        print(f"\n📄 详细结果:\n{json.dumps(result, ensure_ascii=False, indent=2)}")
-
-                else:
-                    print(f"❌ 查询执行失败: {result.get('error', '未知错误')}")
-                    sys.exit(1)
+            _HANDLERS[_mode_from_args(args)](agent, args)
 
     except KeyboardInterrupt:
         print("\n⚠️ 用户中断")
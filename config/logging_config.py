@@ -1,11 +1,78 @@
+import atexit
+import functools
 import logging
+import queue
 import sys
 import os
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, Dict, Any
 
 
+# 格式化器在模块加载时创建一次，由各处理器共享
+_DETAILED_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+_SIMPLE_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+# 后台写日志的监听线程，setup_logging 重新配置时先停止旧的监听
+_listener: Optional[QueueListener] = None
+
+# 业务日志中SQL预览的最大长度
+_SQL_PREVIEW_MAX = 100
+
+
+def _stop_listener() -> None:
+    """停止后台日志线程，写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+class _SizeTrackingRotatingFileHandler(RotatingFileHandler):
+    """
+    在进程内累计已写入的长度来判断是否需要滚动
+
+    标准实现每条日志都要查询一次文件位置和类型；这里只在打开文件（首次写入或滚动后）
+    时取一次文件大小，之后按消息编码后的字节数累加。假定日志文件只由本进程写入
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._size: Optional[int] = None
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        if self._size is None:
+            self._size = os.fstat(self.stream.fileno()).st_size
+
+        # 按编码后的字节数累加（与 fstat 得到的文件大小单位一致，中文在UTF-8下占3字节）；
+        # 与标准实现一致，空文件不滚动
+        msg_len = len(f"{self.format(record)}{self.terminator}".encode(self.encoding or 'utf-8'))
+        if self._size and self._size + msg_len >= self.maxBytes:
+            return True
+        self._size += msg_len
+        return False
+
+    def doRollover(self):
+        super().doRollover()
+        self._size = None
+
+
 def setup_logging(
     level: str = "INFO",
     log_file: Optional[str] = None,
@@ -32,54 +99,60 @@ def setup_logging(
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         log_file = log_dir / f"bigdata_agent_{timestamp}.log"
 
-    # 创建格式化器
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-    simple_formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
     # 获取根日志记录器
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, level.upper(), logging.INFO))
 
-    # 移除现有处理器（避免重复添加）
+    # 停止旧的后台日志线程并移除现有处理器（避免重复添加）
+    _stop_listener()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+        handler.close()
 
-    # 添加控制台处理器
+    handlers = []
+
+    # 控制台处理器
     if enable_console:
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(simple_formatter)
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(_SIMPLE_FORMATTER)
         console_handler.setLevel(root_logger.level)
-        root_logger.addHandler(console_handler)
+        handlers.append(console_handler)
 
-    # 添加文件处理器
+    # 文件处理器
     if enable_file and log_file:
-        from logging.handlers import RotatingFileHandler
-
-        file_handler = RotatingFileHandler(
+        # 延迟到第一条日志写入时才打开文件
+        file_handler = _SizeTrackingRotatingFileHandler(
             log_file,
             maxBytes=max_file_size,
             backupCount=backup_count,
-            encoding='utf-8'
+            encoding='utf-8',
+            delay=True
         )
-        file_handler.setFormatter(detailed_formatter)
+        file_handler.setFormatter(_DETAILED_FORMATTER)
         file_handler.setLevel(root_logger.level)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    if not handlers:
+        return
+
+    # 调用方线程只把日志记录放入队列，格式化和写控制台/文件由后台监听线程完成
+    global _listener
+    log_queue = queue.Queue(-1)
+    root_logger.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
 
-        # 记录日志文件位置
-        print(f"📝 日志文件: {log_file}")
+    if enable_file and log_file:
+        logging.getLogger(__name__).debug("日志文件: %s", log_file)
 
 
+@functools.lru_cache(maxsize=256)
 def get_logger(name: str) -> logging.Logger:
     """
     获取一个指定名称的日志记录器实例。
 
+    日志记录器在 logging 中是单例，按名称缓存后重复获取不再经过 logging 的全局锁。
+
     Args:
         name (str): 通常是当前模块的名称 (__name__)。
 
@@ -100,29 +173,28 @@ def log_performance(logger: Optional[logging.Logger] = None):
             pass
     """
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            nonlocal logger
-            if logger is None:
-                logger = logging.getLogger(func.__module__)
+        # 日志记录器在装饰时确定一次，调用时不再查找
+        log = logger or logging.getLogger(func.__module__)
+        name = func.__name__
 
-            start_time = datetime.now()
-            logger.info(f"开始执行: {func.__name__}")
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # INFO 未启用时直接调用，不计时也不记录
+            if not log.isEnabledFor(logging.INFO):
+                return func(*args, **kwargs)
 
+            start_ns = time.perf_counter_ns()
             try:
                 result = func(*args, **kwargs)
-                end_time = datetime.now()
-                duration = (end_time - start_time).total_seconds()
-
-                logger.info(f"执行完成: {func.__name__}, 耗时: {duration:.3f}秒")
-                return result
-
             except Exception as e:
-                end_time = datetime.now()
-                duration = (end_time - start_time).total_seconds()
-
-                logger.error(f"执行失败: {func.__name__}, 耗时: {duration:.3f}秒, 错误: {str(e)}")
+                duration = (time.perf_counter_ns() - start_ns) / 1e9
+                log.error("执行失败: %s, 耗时: %.3f秒, 错误: %s", name, duration, e)
                 raise
 
+            duration = (time.perf_counter_ns() - start_ns) / 1e9
+            log.info("执行完成: %s, 耗时: %.3f秒", name, duration)
+            return result
+
         return wrapper
     return decorator
 
@@ -136,35 +208,46 @@ class BusinessLogger:
 
     def log_query(self, user_query: str, intent: str = None, confidence: float = None):
         """记录用户查询"""
-        self.logger.info(f"用户查询: '{user_query}' | 意图: {intent} | 置信度: {confidence:.2f}")
+        self.logger.info("用户查询: '%s' | 意图: %s | 置信度: %.2f", user_query, intent, confidence)
 
     def log_sql_generation(self, sql: str, dialect: str = "hive"):
         """记录SQL生成"""
-        # 只记录SQL的前100个字符，避免日志过长
-        sql_preview = sql[:100] + "..." if len(sql) > 100 else sql
-        self.logger.info(f"生成SQL ({dialect}): {sql_preview}")
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        # 只记录SQL的前 _SQL_PREVIEW_MAX 个字符，避免日志过长；短SQL不复制
+        sql_preview = sql if len(sql) <= _SQL_PREVIEW_MAX else sql[:_SQL_PREVIEW_MAX] + "..."
+        self.logger.info("生成SQL (%s): %s", dialect, sql_preview)
 
     def log_execution(self, task_id: str, sql: str, execution_time: float, row_count: int):
         """记录查询执行"""
-        self.logger.info(f"任务执行完成: {task_id} | 耗时: {execution_time:.3f}s | 返回行数: {row_count}")
+        self.logger.info("任务执行完成: %s | 耗时: %.3fs | 返回行数: %s", task_id, execution_time, row_count)
 
     def log_error(self, operation: str, error: str, context: Dict[str, Any] = None):
         """记录错误"""
-        context_str = f" | 上下文: {context}" if context else ""
-        self.logger.error(f"操作失败: {operation} | 错误: {error}{context_str}")
+        if context:
+            self.logger.error("操作失败: %s | 错误: %s | 上下文: %s", operation, error, context)
+        else:
+            self.logger.error("操作失败: %s | 错误: %s", operation, error)
 
     def log_performance(self, operation: str, duration: float, details: Dict[str, Any] = None):
         """记录性能指标"""
-        details_str = f" | 详情: {details}" if details else ""
-        self.logger.info(f"性能指标: {operation} | 耗时: {duration:.3f}s{details_str}")
+        if details:
+            self.logger.info("性能指标: %s | 耗时: %.3fs | 详情: %s", operation, duration, details)
+        else:
+            self.logger.info("性能指标: %s | 耗时: %.3fs", operation, duration)
 
 
-# 全局业务日志记录器实例
-business_logger = BusinessLogger()
+@functools.lru_cache(maxsize=1)
+def get_business_logger() -> BusinessLogger:
+    """获取全局业务日志记录器，首次使用时创建"""
+    return BusinessLogger()
 
 
-# 初始化默认日志配置
-setup_logging()
+def __getattr__(name: str):
+    """兼容旧用法：business_logger 在首次访问时才创建"""
+    if name == "business_logger":
+        return get_business_logger()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # 便捷函数
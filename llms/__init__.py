@@ -1,7 +1,31 @@
 """
 LLM集成模块
+
+SiliconFlowLLM / get_chat_model 在首次访问时才导入，
+避免仅导入本包就加载 openai、langchain_openai
 """
 
-from .siliconflow_llm import SiliconFlowLLM, get_chat_model
+import importlib
+
+# 导出名称 -> 所在子模块
+_LAZY_EXPORTS = {
+    'SiliconFlowLLM': '.siliconflow_llm',
+    'get_chat_model': '.siliconflow_llm',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    """按需导入导出对象，导入后缓存到模块命名空间"""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = ['SiliconFlowLLM', 'get_chat_model']
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
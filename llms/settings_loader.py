@@ -5,10 +5,19 @@
 
 import json
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
+
+@lru_cache(maxsize=1)
 def _find_settings_file() -> Path:
     """查找 setting.json 文件"""
     paths = [
@@ -22,30 +31,39 @@ def _find_settings_file() -> Path:
     raise FileNotFoundError("未找到 setting.json 文件")
 
 
-def load_settings_from_json(json_path: Optional[str] = None) -> Dict[str, Any]:
-    """从 JSON 文件加载配置"""
+@lru_cache(maxsize=8)
+def load_settings_from_json(json_path: Optional[str] = None) -> Mapping[str, Any]:
+    """
+    从 JSON 文件加载配置
+
+    结果按 json_path 缓存，进程内只读取、解析一次；返回只读映射，调用方不能修改缓存内容。
+    修改 setting.json 后需调用 load_settings_from_json.cache_clear() 重新加载
+    """
     if json_path is None:
         json_path = _find_settings_file()
 
-    path = Path(json_path)
-    with open(path, 'r', encoding='utf-8') as f:
-        raw = json.load(f)
+    data = Path(json_path).read_bytes()
+    raw = orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
 
     if not isinstance(raw, dict):
         return raw
 
+    # 已是扁平结构（没有 settings 分组和嵌套配置）时直接使用，无需合并
+    if "settings" not in raw and not any(isinstance(v, dict) for v in raw.values()):
+        return MappingProxyType(raw)
+
     # 合并配置
     settings = raw.get("settings", {}).copy()
     for k, v in raw.items():
         if k != "settings" and not isinstance(v, dict):
             settings[k] = v
     if "WAN_API_SETTINGS" in raw:
-        settings["WAN_API_SETTINGS"] = raw["WAN_API_SETTINGS"]
+        settings["WAN_API_SETTINGS"] = MappingProxyType(raw["WAN_API_SETTINGS"])
 
-    return settings
+    return MappingProxyType(settings)
 
 
-def setup_environment_from_settings(settings: Optional[Dict[str, Any]] = None) -> None:
+def setup_environment_from_settings(settings: Optional[Mapping[str, Any]] = None) -> None:
     """从配置字典设置环境变量"""
     if settings is None:
         settings = load_settings_from_json()
@@ -69,7 +87,7 @@ def setup_environment_from_settings(settings: Optional[Dict[str, Any]] = None) -
         os.environ["WAN_API_KEY"] = str(wan_settings["WAN_API_KEY"])
 
 
-def load_and_setup_settings(json_path: Optional[str] = None) -> Dict[str, Any]:
+def load_and_setup_settings(json_path: Optional[str] = None) -> Mapping[str, Any]:
     """加载配置并设置环境变量（便捷函数）"""
     settings = load_settings_from_json(json_path)
     setup_environment_from_settings(settings)
@@ -3,69 +3,84 @@
 使用硅基流动API进行文本生成
 """
 
+import logging
 import os
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
+import httpx
 from openai import OpenAI
 from langchain_openai import ChatOpenAI
 from bigdata_agent.core.base_llm import BaseLLM
+from .settings_loader import load_settings_from_json
 
 
 class SiliconFlowLLM(BaseLLM):
     """硅基流动LLM实现类"""
 
+    # invoke 未指定 temperature / max_tokens 时使用的默认值
+    default_temperature = 0.7
+    default_max_tokens = 4000
+
     def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None):
         """初始化硅基流动客户端"""
         super().__init__(self._get_api_key(api_key), model_name)
 
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self._get_base_url()
-        )
+        # 相同 api_key / base_url 的实例共用一个客户端及其连接池
+        self.client = _shared_openai_client(self.api_key, self._get_base_url())
         self.default_model = model_name or self._get_model_name()
 
     def _get_default_model(self) -> str:
         """获取默认模型名称"""
         return self._get_model_name()
 
-    def _get_from_settings(self, key: str, default: Optional[str] = None) -> Optional[str]:
-        """从配置文件获取设置"""
-        try:
-            from config.settings_loader import load_settings_from_json
-            settings = load_settings_from_json()
-            return settings.get(key, default)
-        except:
-            return default
-
     def _get_api_key(self, api_key: Optional[str] = None) -> str:
         """获取API密钥"""
         if api_key:
             return api_key
 
-        api_key = os.getenv("SILICONFLOW_API_KEY") or self._get_from_settings("SILICONFLOW_API_KEY")
+        api_key = _resolved_config()[0]
         if not api_key:
             raise ValueError("硅基流动API Key未找到！请设置SILICONFLOW_API_KEY环境变量或在setting.json中配置")
         return api_key
 
     def _get_base_url(self) -> str:
         """获取基础URL"""
-        return os.getenv("SILICONFLOW_BASE_URL") or self._get_from_settings("SILICONFLOW_BASE_URL", "https://api.siliconflow.cn/v1")
+        return _resolved_config()[1]
 
     def _get_model_name(self) -> str:
         """获取模型名称"""
-        return os.getenv("SILICONFLOW_MODEL") or self._get_from_settings("SILICONFLOW_CHAT_MODEL", "deepseek-ai/DeepSeek-V3")
+        return _resolved_config()[2]
     
     def invoke(self, system_prompt: str, user_prompt: str, **kwargs) -> str:
-        """调用硅基流动API生成回复"""
+        """
+        调用硅基流动API生成回复
+
+        kwargs 支持 temperature、max_tokens，以及约束输出格式的
+        response_format（OpenAI兼容格式，如 {"type": "json_object"}）或
+        response_schema（JSON Schema，转换为 json_schema 类型的 response_format）；
+        传入 messages（OpenAI格式的消息列表）时直接使用，忽略 system_prompt / user_prompt
+        """
+        request = {}
+        if kwargs.get("response_schema") is not None:
+            request["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": kwargs["response_schema"]}
+            }
+        elif kwargs.get("response_format") is not None:
+            request["response_format"] = kwargs["response_format"]
+
         try:
             response = self.client.chat.completions.create(
                 model=self.default_model,
-                messages=[
+                messages=kwargs.get("messages") or [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                temperature=kwargs.get("temperature", 0.7),
-                max_tokens=kwargs.get("max_tokens", 4000),
-                stream=False
+                temperature=kwargs.get("temperature", self.default_temperature),
+                max_tokens=kwargs.get("max_tokens", self.default_max_tokens),
+                stream=False,
+                **request
             )
             content = response.choices[0].message.content or "" if response.choices else ""
             return self.validate_response(content)
@@ -73,6 +88,33 @@ class SiliconFlowLLM(BaseLLM):
             print(f"硅基流动API调用错误: {str(e)}")
             raise
 
+    def invoke_batch(self, system_prompt: str, user_prompts: List[str],
+                     return_exceptions: bool = False, **kwargs) -> List[Any]:
+        """并发调用硅基流动API，并发数由 max_workers 参数控制（默认8）"""
+        if not user_prompts:
+            return []
+
+        max_workers = min(len(user_prompts), kwargs.pop("max_workers", 8))
+        # 系统消息只构建一次，各条请求共用
+        system_message = {"role": "system", "content": system_prompt}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.invoke, system_prompt, user_prompt,
+                                messages=[system_message, {"role": "user", "content": user_prompt}],
+                                **kwargs)
+                for user_prompt in user_prompts
+            ]
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
     def get_model_info(self) -> Dict[str, Any]:
         """获取当前模型信息"""
         return {
@@ -82,33 +124,71 @@ class SiliconFlowLLM(BaseLLM):
         }
 
 
-def _get_config() -> tuple[str, str, str]:
-    """获取硅基流动配置 (api_key, base_url, model_name)"""
+# 已解析出 api_key 的配置，未找到 api_key 时不缓存
+_cached_config: Optional[Tuple[str, str, str]] = None
+
+
+def _resolved_config() -> Tuple[Optional[str], str, str]:
+    """
+    解析硅基流动配置 (api_key, base_url, model_name)
+
+    环境变量优先，其次为 setting.json。找到 api_key 后缓存结果，进程内不再解析；
+    未找到时不缓存，之后设置环境变量或补充配置文件即可生效。
+    修改已缓存的配置后需调用 _clear_resolved_config()
+    """
+    global _cached_config
+    if _cached_config is not None:
+        return _cached_config
+
     api_key = os.getenv("SILICONFLOW_API_KEY")
-    if not api_key:
+    base_url = os.getenv("SILICONFLOW_BASE_URL")
+    model_name = os.getenv("SILICONFLOW_MODEL")
+
+    # 环境变量未配齐时才读取配置文件
+    if not (api_key and base_url and model_name):
         try:
-            from config.settings_loader import load_settings_from_json
             settings = load_settings_from_json()
-            api_key = settings.get("SILICONFLOW_API_KEY")
-        except:
-            pass
+        except FileNotFoundError:
+            settings = {}
+        except ValueError as e:
+            logging.getLogger(__name__).warning("setting.json 解析失败，忽略配置文件: %s", e)
+            settings = {}
+        api_key = api_key or settings.get("SILICONFLOW_API_KEY")
+        base_url = base_url or settings.get("SILICONFLOW_BASE_URL", "https://api.siliconflow.cn/v1")
+        model_name = model_name or settings.get("SILICONFLOW_CHAT_MODEL", "deepseek-ai/DeepSeek-V3")
+
+    config = (api_key, base_url, model_name)
+    if api_key:
+        _cached_config = config
+    return config
+
+
+def _clear_resolved_config() -> None:
+    """清除缓存的配置，下次调用 _resolved_config 时重新解析"""
+    global _cached_config
+    _cached_config = None
+
+
+@lru_cache(maxsize=1)
+def _shared_http_client() -> httpx.Client:
+    """进程内共享的HTTP连接池，OpenAI客户端与LangChain聊天模型共用"""
+    return httpx.Client(limits=httpx.Limits(max_keepalive_connections=20))
+
+
+@lru_cache(maxsize=4)
+def _shared_openai_client(api_key: str, base_url: str) -> OpenAI:
+    """按 (api_key, base_url) 共享的OpenAI客户端，底层使用共享的HTTP连接池"""
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=_shared_http_client())
+
+
+def _get_config() -> Tuple[str, str, str]:
+    """获取硅基流动配置 (api_key, base_url, model_name)"""
+    api_key, base_url, model_name = _resolved_config()
     if not api_key:
         raise ValueError("硅基流动API Key未找到！请设置SILICONFLOW_API_KEY环境变量或在setting.json中配置")
 
-    base_url = os.getenv("SILICONFLOW_BASE_URL") or _get_from_settings_static("SILICONFLOW_BASE_URL", "https://api.siliconflow.cn/v1")
-    model_name = os.getenv("SILICONFLOW_MODEL") or _get_from_settings_static("SILICONFLOW_CHAT_MODEL", "deepseek-ai/DeepSeek-V3")
-
     return api_key, base_url, model_name
 
-def _get_from_settings_static(key: str, default: Optional[str] = None) -> Optional[str]:
-    """静态方法：从配置文件获取设置"""
-    try:
-        from config.settings_loader import load_settings_from_json
-        settings = load_settings_from_json()
-        return settings.get(key, default)
-    except:
-        return default
-
 def get_chat_model() -> ChatOpenAI:
     """获取LangChain兼容的聊天模型"""
     api_key, base_url, model_name = _get_config()
@@ -117,6 +197,7 @@ def get_chat_model() -> ChatOpenAI:
         base_url=base_url,
         model=model_name,
         temperature=0.7,
-        max_tokens=4000
+        max_tokens=4000,
+        http_client=_shared_http_client()
     )
 
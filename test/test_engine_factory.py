@@ -0,0 +1,125 @@
+"""
+执行引擎公共逻辑测试：LIMIT改写、缓存键规范化、相同查询的single-flight合并
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from bigdata_agent.execution.engine_factory import ExecutionEngine, inject_limit, _normalize_sql
+
+
+class _CountingEngine(ExecutionEngine):
+    """记录实际执行次数的测试引擎，每次执行耗时 delay 秒"""
+
+    def __init__(self, config, delay=0.2):
+        super().__init__(config)
+        self.delay = delay
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def connect(self):
+        self.connected = True
+        return True
+
+    def disconnect(self):
+        self.connected = False
+
+    def _execute_query(self, sql, task):
+        with self._calls_lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if 'boom' in sql:
+            raise RuntimeError('boom')
+        return {'success': True, 'data': [{'sql': sql}], 'task_id': task.task_config.task_id}
+
+    def execute_count_query(self, sql, task):
+        return 0
+
+    def get_status(self):
+        return {}
+
+    def cancel_task(self, task_id):
+        pass
+
+
+def _task(task_id, preview=False, cacheable=False):
+    return SimpleNamespace(task_config=SimpleNamespace(task_id=task_id, preview=preview, cacheable=cacheable))
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT a FROM t", "SELECT a FROM t LIMIT 10"),
+    ("SELECT a FROM t;", "SELECT a FROM t LIMIT 10"),
+    ("SELECT a FROM t LIMIT 500", "SELECT a FROM t LIMIT 10"),
+    ("SELECT a FROM t LIMIT 5", "SELECT a FROM t LIMIT 5"),
+    ("SELECT a FROM t LIMIT 500 OFFSET 20", "SELECT a FROM t LIMIT 10 OFFSET 20"),
+    ("SELECT a FROM t LIMIT 20, 500", "SELECT a FROM t LIMIT 20, 10"),
+    ("SELECT a FROM t LIMIT 20, 5", "SELECT a FROM t LIMIT 20, 5"),
+    ("SELECT a FROM t ORDER BY a OFFSET 5 ROWS FETCH NEXT 50 ROWS ONLY",
+     "SELECT * FROM (SELECT a FROM t ORDER BY a OFFSET 5 ROWS FETCH NEXT 50 ROWS ONLY) _limited LIMIT 10"),
+    ("WITH x AS (SELECT 1 AS a) SELECT a FROM x", "WITH x AS (SELECT 1 AS a) SELECT a FROM x LIMIT 10"),
+    ("SELECT a FROM t -- 全部数据", "SELECT a FROM t LIMIT 10"),
+    ("SELECT a FROM t LIMIT 500 /* 分页 */ ;", "SELECT a FROM t LIMIT 10"),
+    ("SELECT a -- 注释\nFROM t", "SELECT a -- 注释\nFROM t LIMIT 10"),
+    ("SELECT /*+ MAPJOIN(b) */ a FROM t", "SELECT /*+ MAPJOIN(b) */ a FROM t LIMIT 10"),
+    ("SELECT a FROM t WHERE s = 'LIMIT 500'", "SELECT a FROM t WHERE s = 'LIMIT 500' LIMIT 10"),
+    ("SELECT a FROM t WHERE s = 'x -- y'", "SELECT a FROM t WHERE s = 'x -- y' LIMIT 10"),
+])
+def test_inject_limit(sql, expected):
+    assert inject_limit(sql, 10) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "INSERT INTO t SELECT * FROM s",
+    "SHOW TABLES",
+    "SET hive.exec.parallel=true",
+])
+def test_inject_limit_skips_non_queries(sql):
+    assert inject_limit(sql, 10) == sql
+
+
+def test_normalize_sql_collapses_whitespace_outside_literals():
+    assert _normalize_sql("SELECT  a\n FROM   t ;") == "SELECT a FROM t"
+    assert _normalize_sql("SELECT 'a  b' FROM `my  t`") == "SELECT 'a  b' FROM `my  t`"
+    assert _normalize_sql("SELECT 'a  b'") != _normalize_sql("SELECT 'a b'")
+    assert _normalize_sql("SELECT 'it''s  x'") == "SELECT 'it''s  x'"
+
+
+def test_concurrent_identical_queries_execute_once():
+    engine = _CountingEngine({'coalesce_queries': True})
+    results = [None] * 8
+
+    def run(index):
+        results[index] = engine.execute_query("SELECT 1", _task(f"t{index}"))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert engine.calls == 1
+    assert [result['task_id'] for result in results] == [f"t{i}" for i in range(8)]
+    assert len({id(result) for result in results}) == 8
+    assert engine._inflight == {}
+
+
+def test_execute_async_shares_execution_and_propagates_errors():
+    engine = _CountingEngine({})
+    futures = [engine.execute_async("SELECT 2", _task(f"a{i}")) for i in range(3)]
+    results = [future.result() for future in futures]
+
+    assert engine.calls == 1
+    assert [result['task_id'] for result in results] == ["a0", "a1", "a2"]
+
+    with pytest.raises(RuntimeError, match='boom'):
+        engine.execute_async("SELECT boom", _task("b")).result()
+    assert engine._inflight == {}
+
+
+def test_preview_task_is_limited_before_execution():
+    engine = _CountingEngine({'preview_limit': 5}, delay=0)
+    result = engine.execute_query("SELECT a FROM t -- 预览", _task("p", preview=True))
+    assert result['data'] == [{'sql': "SELECT a FROM t LIMIT 5"}]